@@ -1,5 +1,20 @@
+import argparse
+
+
 def main():
-    print("Hello from smart-campus-assistant!")
+    parser = argparse.ArgumentParser(description="smart-campus-assistant")
+    commands = parser.add_subparsers(dest="command")
+    batch = commands.add_parser("batch", help="answer every question of a JSONL file")
+    batch.add_argument("input", help="JSONL with a 'question' and optional 'id' per line")
+    batch.add_argument("-o", "--output", default="answers.jsonl", help="results JSONL (default: answers.jsonl)")
+    batch.add_argument("-c", "--concurrency", type=int, default=8, help="questions answered in parallel")
+    args = parser.parse_args()
+
+    if args.command == "batch":
+        from src.agents.batchRunner import run_batch_sync
+        run_batch_sync(args.input, args.output, args.concurrency)
+    else:
+        print("Hello from smart-campus-assistant!")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,202 @@
+import json
+import time
+import asyncio
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from src.retrival import RAGSearch
+from src.retrival.queryCache import normalize_query
+from src.agents.researchAgent import agent, initial_state
+
+
+def question_key(question: str) -> str:
+    """Duplicate detection key: case, whitespace and trailing punctuation do not matter."""
+    return normalize_query(question).rstrip("?.! ")
+
+
+class RetrievalBatcher:
+    """
+    Thread-safe micro-batcher in front of a batched search function.
+
+    Graph runs call it like a single search; calls arriving within max_wait
+    seconds of each other (or until max_batch are waiting) are answered by one
+    search_many call, i.e. one encode pass and one index search.
+    """
+
+    def __init__(self, search_many: Callable[[List[str], int], List[Tuple[str, List[float]]]],
+                 max_batch: int = 32, max_wait: float = 0.01):
+        self.search_many = search_many
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._lock = threading.Lock()
+        self._pending: List[Tuple[str, int, Future]] = []
+        self.batches = 0
+        self.queries = 0
+
+    def __call__(self, query: str, top_k: int = 10) -> Tuple[str, List[float]]:
+        future = Future()
+        with self._lock:
+            self._pending.append((query, top_k, future))
+            leader = len(self._pending) == 1
+            full = len(self._pending) >= self.max_batch
+        if full:
+            self._flush()
+        elif leader:
+            # the first caller waits briefly for company, then searches for everyone queued
+            time.sleep(self.max_wait)
+            self._flush()
+        return future.result()
+
+    def _flush(self):
+        with self._lock:
+            batch, self._pending = self._pending, []
+        if not batch:
+            return
+        self.batches += 1
+        self.queries += len(batch)
+        by_top_k: Dict[int, List[Tuple[str, Future]]] = {}
+        for query, top_k, future in batch:
+            by_top_k.setdefault(top_k, []).append((query, future))
+        for top_k, items in by_top_k.items():
+            try:
+                results = self.search_many([query for query, _ in items], top_k)
+            except Exception as e:
+                for _, future in items:
+                    future.set_exception(e)
+                continue
+            for (_, future), result in zip(items, results):
+                future.set_result(result)
+
+
+def read_questions(path: str) -> Iterator[Tuple[str, str]]:
+    """Lazily yield (id, question) from a JSONL file; the id defaults to the line number."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                print(f"[WARN] {path}:{line_no} is not valid JSON ({e}), skipped")
+                continue
+            if not isinstance(record, dict):
+                print(f"[WARN] {path}:{line_no} is not a JSON object, skipped")
+                continue
+            question = record.get("question") or record.get("query") or record.get("user_input")
+            if not question:
+                print(f"[WARN] {path}:{line_no} has no question, skipped")
+                continue
+            # 0 and "" are valid ids: only a missing field falls back
+            request_id = record.get("id")
+            if request_id is None:
+                request_id = record.get("request_id")
+            yield str(line_no if request_id is None else request_id), question
+
+
+async def run_batch(input_path: str, output_path: str, concurrency: int = 8, app=None,
+                    search_many: Optional[Callable] = None, max_batch: int = 32, max_wait: float = 0.01,
+                    answer_cache=None, max_shared_answers: int = 10000) -> dict:
+    """
+    Answer every question of a JSONL file with one compiled agent graph.
+
+    Up to `concurrency` distinct questions are in flight at once; questions that
+    normalise to the same text are answered once and shared. Retrieval across
+    in-flight runs goes through a RetrievalBatcher. One JSON line per input
+    question is appended to output_path as soon as its answer is ready
+    (completion order), with the run's timings.
+
+    Args:
+        input_path: JSONL with a "question" (or "query"/"user_input") and optional "id" per line
+        output_path: JSONL results file, overwritten
+        concurrency: distinct questions answered in parallel
+        app: compiled graph to use (default: agent() over the batcher)
+        search_many: batched retrieval (default: RAGSearch().search_many_with_scores)
+        max_batch, max_wait: retrieval micro-batching limits
+        answer_cache: optional SemanticAnswerCache, so paraphrased questions are answered once too
+        max_shared_answers: finished answers kept for duplicate questions (LRU), bounding memory on large files
+
+    Returns:
+        Run stats
+    """
+    start = time.perf_counter()
+    batcher = RetrievalBatcher(search_many or RAGSearch().search_many_with_scores, max_batch, max_wait)
+    app = app or agent(search=batcher, answer_cache=answer_cache)
+    limit = asyncio.Semaphore(concurrency)
+    # bounds how far reading runs ahead of answering
+    window = asyncio.Semaphore(concurrency * 4)
+    answers: "OrderedDict[str, asyncio.Task]" = OrderedDict()
+    latencies: List[float] = []
+    stats = {"questions": 0, "unique": 0, "duplicates": 0, "errors": 0}
+
+    async def answer(question: str) -> dict:
+        async with limit:
+            t0 = time.perf_counter()
+            try:
+                result = await app.ainvoke(initial_state(question))
+            except Exception as e:
+                return {"error": repr(e), "seconds": time.perf_counter() - t0}
+            scores = result.get("retrieval_scores") or []
+            return {
+                "answer": result.get("explanation"),
+                "rewritten_query": result.get("rewritten_query"),
+                "rewrite_count": result.get("rewrite_count", 0),
+                "best_distance": min(scores) if scores else None,
+                "seconds": time.perf_counter() - t0,
+            }
+
+    with open(output_path, "w", encoding="utf-8") as out:
+
+        async def handle(request_id: str, question: str, task: asyncio.Task, duplicate: bool):
+            try:
+                queued = time.perf_counter()
+                outcome = await task
+                record = {"id": request_id, "question": question, "duplicate": duplicate, **outcome,
+                          "wall_seconds": time.perf_counter() - queued}
+                if outcome.get("error"):
+                    stats["errors"] += 1
+                elif not duplicate:
+                    latencies.append(outcome["seconds"])
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+            finally:
+                window.release()
+
+        handlers = set()
+        for request_id, question in read_questions(input_path):
+            await window.acquire()
+            stats["questions"] += 1
+            key = question_key(question)
+            task = answers.get(key)
+            duplicate = task is not None
+            if duplicate:
+                stats["duplicates"] += 1
+                answers.move_to_end(key)
+            else:
+                stats["unique"] += 1
+                task = answers[key] = asyncio.ensure_future(answer(question))
+                # forget the least recently asked finished answers; in-flight ones stay shared
+                while len(answers) > max_shared_answers and next(iter(answers.values())).done():
+                    answers.popitem(last=False)
+            handler = asyncio.ensure_future(handle(request_id, question, task, duplicate))
+            handlers.add(handler)
+            handler.add_done_callback(handlers.discard)
+        if handlers:
+            await asyncio.gather(*handlers)
+
+    latencies.sort()
+    stats.update({
+        "seconds": time.perf_counter() - start,
+        "p50_seconds": latencies[len(latencies) // 2] if latencies else None,
+        "p95_seconds": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else None,
+        "retrieval_batches": batcher.batches,
+        "retrieval_queries": batcher.queries,
+    })
+    print(f"[INFO] Answered {stats['questions']} questions ({stats['unique']} unique, {stats['errors']} errors) "
+          f"in {stats['seconds']:.1f}s, {batcher.queries} retrievals in {batcher.batches} batches")
+    return stats
+
+
+def run_batch_sync(input_path: str, output_path: str, concurrency: int = 8, **kwargs: Any) -> dict:
+    return asyncio.run(run_batch(input_path, output_path, concurrency, **kwargs))
@@ -1,7 +1,10 @@
-from typing import TypedDict, Sequence,Optional,List
-from src.llm import ask_groq,ask_gemini
+import os
+from typing import TypedDict, Sequence,Optional,List,Iterator,Callable,Tuple
+from src.llm import ask_groq,ask_gemini,stream_gemini
 from src.retrival import RAGSearch
+from src.retrival.contextAssembler import NO_RESULTS
 from langgraph.graph import END, StateGraph, START
+from langgraph.config import get_stream_writer
 from langgraph.prebuilt import tools_condition
 
 class AgentState(TypedDict):
@@ -10,28 +13,56 @@ class AgentState(TypedDict):
     retrieved_docs: List[str]
     validated_docs:List[str]
     explanation:str
-    
-
-def retrieve_step(state: AgentState):
+    retrieval_scores:List[float]
+    rewrite_count:int
+    store_version:Optional[int]
+
+# Score gate in front of the LLM validator. Distances are squared L2 between
+# unit-normalised MiniLM embeddings (= 2 - 2*cosine): at or below ACCEPT the
+# context is taken without asking the LLM, at or above REJECT the query is
+# rewritten straight away, and only the band in between goes to the validator.
+ACCEPT_DISTANCE = float(os.getenv("RAG_ACCEPT_DISTANCE", "0.6"))
+REJECT_DISTANCE = float(os.getenv("RAG_REJECT_DISTANCE", "1.4"))
+MAX_REWRITES = int(os.getenv("RAG_MAX_REWRITES", "2"))
+
+# (query, top_k) -> (context, hit distances), e.g. RAGSearch().search_with_scores
+SearchFn = Callable[[str, int], Tuple[str, List[float]]]
+
+def retrieve_step(state: AgentState, search: Optional[SearchFn] = None):
     if state["rewritten_query"] is None:
         query = state["user_input"]
     else:
         query = state["rewritten_query"]
-    rag_search=RAGSearch()
-    context=rag_search.search(query,top_k=10)
+    search=search or RAGSearch().search_with_scores
+    context,scores=search(query,10)
     state["retrieved_docs"] = context
+    state["retrieval_scores"] = scores
     # print(f"[INFO] retrived the content for the query :{query}")
     return state
 
 def validate(state:AgentState):
-    
+
+    scores=state.get("retrieval_scores") or []
+    best=min(scores) if scores else None
+    if best is not None and best<=ACCEPT_DISTANCE:
+        print(f"---DECISION: DOCS RELEVANT (distance {best:.3f}, no LLM check)---")
+        return "next_step"
+    if state.get("rewrite_count",0)>=MAX_REWRITES:
+        print(f"---DECISION: REWRITE LIMIT {MAX_REWRITES} REACHED, ANSWERING WITH BEST CONTEXT---")
+        return "next_step"
+    # lexical-only retrieval returns context without distances: leave that to the LLM check
+    no_docs=best is None and state.get("retrieved_docs") in (None,"",NO_RESULTS)
+    if no_docs or (best is not None and best>=REJECT_DISTANCE):
+        print(f"---DECISION: DOCS NOT RELEVANT (distance {best if best is None else round(best,3)}, no LLM check)---")
+        return "rewrite"
+
     query = state["user_input"]
     context=state["retrieved_docs"]
     prompt=f"""Your are an validator Expert. User question: {query} 
             and the retrived context :{context}
             now validate for any llm can answer the question using this context.
             NOTE:You should return Only : Yes or No """
-    result = ask_groq(prompt=prompt)
+    result = ask_groq(prompt=prompt, cache=True)
 
     print(f"[INFO] context is validated :{result}")
 
@@ -52,9 +83,10 @@ def rewrite(state:AgentState):
                     Here is the initial user question: {query} 
                     return only the improved question
                     """
-    result = ask_gemini(prompt=prompt)
+    result = ask_gemini(prompt=prompt, cache=True)
     # print(f"[INFO] query is rewritten :{result}")
     state["rewritten_query"]=result.strip()
+    state["rewrite_count"]=state.get("rewrite_count",0)+1
     return state
 
 def explain(state:AgentState):
@@ -86,47 +118,93 @@ def explain(state:AgentState):
         {query}
 
     """
-    result = ask_gemini(prompt=prompt)
+    # tokens go to stream_mode="custom" consumers (see stream_agent) as they arrive;
+    # under a plain invoke() the writer is a no-op
+    writer=get_stream_writer()
+    pieces=[]
+    for token in stream_gemini(prompt=prompt):
+        pieces.append(token)
+        writer({"token":token})
+    result="".join(pieces).strip()
     print(f"[INFO] result from llm:{result}")
     state["explanation"]=result
 
     return state
 
-def agent():
-
-    workflow=StateGraph(AgentState)
-    workflow.add_node("retriver",retrieve_step)
-    workflow.add_node("rewrite_query",rewrite)
-    workflow.add_node("llm",explain)
+def agent(search: Optional[SearchFn] = None, answer_cache=None):
+    """
+    Compile the research graph.
+    search: retrieval function used by the retriver node (default: RAGSearch().search_with_scores),
+            e.g. a batcher shared by concurrent runs
+    answer_cache: optional SemanticAnswerCache; a paraphrase of an already answered
+                  question then goes straight to END with the cached explanation
+    """
 
-    workflow.add_edge(START,"retriver")
-    workflow.add_edge("rewrite_query","retriver")
-    workflow.add_conditional_edges("retriver",validate,{"next_step":"llm","rewrite":"rewrite_query"})
-    workflow.add_edge("llm",END)
-    app=workflow.compile()
+    def retriver(state: AgentState):
+        return retrieve_step(state, search)
 
-    return app
+    def check_cache(state: AgentState):
+        # version first: an answer is only cached for the store it was retrieved from
+        state["store_version"]=answer_cache.version()
+        cached=answer_cache.lookup(state["user_input"])
+        if cached is not None:
+            get_stream_writer()({"token":cached})
+            state["explanation"]=cached
+        return state
 
-if __name__=="__main__":
+    def llm(state: AgentState):
+        state=explain(state)
+        answer_cache.add(state["user_input"],state["explanation"],state.get("store_version"))
+        return state
 
     workflow=StateGraph(AgentState)
-    workflow.add_node("retriver",retrieve_step)
+    workflow.add_node("retriver",retriver)
     workflow.add_node("rewrite_query",rewrite)
-    workflow.add_node("llm",explain)
 
-    workflow.add_edge(START,"retriver")
+    if answer_cache is None:
+        workflow.add_node("llm",explain)
+        workflow.add_edge(START,"retriver")
+    else:
+        workflow.add_node("llm",llm)
+        workflow.add_node("semantic_cache",check_cache)
+        workflow.add_edge(START,"semantic_cache")
+        workflow.add_conditional_edges("semantic_cache",lambda state:"hit" if state.get("explanation") else "miss",
+                                       {"hit":END,"miss":"retriver"})
     workflow.add_edge("rewrite_query","retriver")
     workflow.add_conditional_edges("retriver",validate,{"next_step":"llm","rewrite":"rewrite_query"})
     workflow.add_edge("llm",END)
     app=workflow.compile()
 
-    initial_state = {
-    "user_input": "What is meant by ‘electric field lines’?",
+    return app
+
+def initial_state(question:str)->AgentState:
+    return {
+    "user_input": question,
     "rewritten_query": None,
     "retrieved_docs": [],
-    "validated_docs": []
+    "validated_docs": [],
+    "retrieval_scores": [],
+    "rewrite_count": 0,
+    "store_version": None
     }
-    result = app.invoke(initial_state)
+
+def stream_agent(question:str,app=None)->Iterator[str]:
+    """
+    Run the agent for one question and yield the answer's tokens as gemini
+    produces them. Retrieval, validation and rewrites run first and emit
+    nothing, so the first token marks the user-visible latency.
+    app: a compiled agent() graph to reuse; built on demand when None.
+    """
+    app=app or agent()
+    for event in app.stream(initial_state(question),stream_mode="custom"):
+        if "token" in event:
+            yield event["token"]
+
+if __name__=="__main__":
+
+    app=agent()
+
+    result = app.invoke(initial_state("What is meant by ‘electric field lines’?"))
 
     # print("Rewritten Query:", result.get("rewritten_query"))
     # print("Retrieved Docs:", result.get("retrieved_docs"))
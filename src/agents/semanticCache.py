@@ -0,0 +1,107 @@
+import os
+import itertools
+import threading
+import faiss
+import numpy as np
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from src.retrival.registry import current_vector_store
+
+DEFAULT_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.9"))
+
+
+class SemanticAnswerCache:
+    """
+    Final answers of past questions, found again by question similarity.
+
+    Question embeddings (the same model the store retrieves with, so the
+    encode is shared with the retrieval that follows a miss) live in a small
+    inner-product FAISS index; a lookup returns the stored explanation when the
+    cosine similarity to the best past question reaches threshold. Every entry
+    is tied to the vector store version it was answered against, and the cache
+    empties itself as soon as the store changes.
+    """
+
+    def __init__(self, persist_dir: str = "faiss_store", embedding_model: str = "all-MiniLM-L6-v2",
+                 threshold: float = DEFAULT_THRESHOLD, max_entries: int = 10000):
+        """
+        Args:
+            persist_dir, embedding_model: the vector store answers come from
+            threshold: minimum cosine similarity for a hit
+            max_entries: oldest entries are dropped beyond this
+        """
+        self.persist_dir = persist_dir
+        self.embedding_model = embedding_model
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._next_id = itertools.count().__next__
+        self._index = None
+        self._entries: "OrderedDict[int, Tuple[str, str]]" = OrderedDict()
+        self._version = None
+        self.hits = 0
+        self.misses = 0
+
+    def _store(self):
+        return current_vector_store(self.persist_dir, self.embedding_model)
+
+    def version(self) -> int:
+        """Version of the backing vector store; pass it to add() to tie an answer to what it was built from."""
+        return self._store().version
+
+    def _embed(self, store, question: str) -> np.ndarray:
+        embedding = np.array(store.embed_queries([question]), dtype='float32')
+        faiss.normalize_L2(embedding)
+        return embedding
+
+    def _sync_version(self, version: int):
+        if version != self._version:
+            if self._entries:
+                print(f"[INFO] Vector store changed, dropping {len(self._entries)} cached answers")
+            self._index = None
+            self._entries.clear()
+            self._version = version
+
+    def lookup(self, question: str) -> Optional[str]:
+        """Cached explanation for a question similar enough to a past one, else None."""
+        store = self._store()
+        embedding = self._embed(store, question)
+        with self._lock:
+            self._sync_version(store.version)
+            if self._index is not None and self._index.ntotal:
+                similarities, ids = self._index.search(embedding, 1)
+                if ids[0][0] != -1 and similarities[0][0] >= self.threshold:
+                    cached_question, explanation = self._entries[int(ids[0][0])]
+                    self.hits += 1
+                    print(f"[INFO] Semantic cache hit ({similarities[0][0]:.3f}) for '{question}' via '{cached_question}'")
+                    return explanation
+            self.misses += 1
+        return None
+
+    def add(self, question: str, explanation: str, version: Optional[int] = None):
+        """version: store version the answer was retrieved against; stale answers are not cached."""
+        store = self._store()
+        if version is not None and version != store.version:
+            return
+        embedding = self._embed(store, question)
+        with self._lock:
+            self._sync_version(store.version)
+            if self._index is None:
+                self._index = faiss.IndexIDMap2(faiss.IndexFlatIP(embedding.shape[1]))
+            entry_id = self._next_id()
+            self._index.add_with_ids(embedding, np.array([entry_id], dtype='int64'))
+            self._entries[entry_id] = (question, explanation)
+            if len(self._entries) > self.max_entries:
+                oldest, _ = self._entries.popitem(last=False)
+                self._index.remove_ids(np.array([oldest], dtype='int64'))
+
+    def clear(self):
+        with self._lock:
+            self._index = None
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0}
@@ -1 +1,6 @@
-from .client import ask_groq,ask_gemini
\ No newline at end of file
+from .client import (
+    ask_groq, ask_gemini, aask_groq, aask_gemini, stream_gemini, astream_gemini,
+    configure_gemini, gemini_model, use_fake_provider
+)
+from .fake import FakeLLM
+from .cache import configure_cache, disable_cache, get_response_cache
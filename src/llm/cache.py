@@ -0,0 +1,136 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Any, Dict, Optional
+
+DEFAULT_TTL = 7 * 24 * 3600
+DEFAULT_MAX_ENTRIES = 50_000
+
+
+def make_key(provider: str, model: str, prompt: str, params: Optional[Dict[str, Any]] = None) -> str:
+    payload = json.dumps([provider, model, hashlib.sha256(prompt.encode("utf-8")).hexdigest(), params or {}],
+                         sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    SQLite-backed LLM response cache, keyed by (provider, model, prompt hash,
+    generation params). Safe to share between threads (one connection each) and
+    between processes (WAL journal). Entries expire after ttl seconds; beyond
+    max_entries the least recently used ones are evicted.
+    """
+
+    def __init__(self, path: str = "llm_cache.sqlite", ttl: float = DEFAULT_TTL, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self._puts = 0
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._conn() as conn:
+            conn.execute("""CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                provider TEXT,
+                model TEXT,
+                response TEXT,
+                created REAL,
+                last_access REAL,
+                latency REAL
+            )""")
+            conn.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses(last_access)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        conn = self._conn()
+        row = conn.execute("SELECT response, created, latency FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None or now - row[1] > self.ttl:
+            if row is not None:
+                with conn:
+                    conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            with self._stats_lock:
+                self.misses += 1
+            return None
+        with conn:
+            conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+        with self._stats_lock:
+            self.hits += 1
+            self.saved_seconds += row[2] or 0.0
+        return row[0]
+
+    def put(self, key: str, provider: str, model: str, response: str, latency: float):
+        now = time.time()
+        conn = self._conn()
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                         (key, provider, model, response, now, now, latency))
+        with self._stats_lock:
+            self._puts += 1
+            evict = self._puts % 100 == 1
+        if evict:
+            self.evict()
+
+    def evict(self):
+        """Drop expired entries, then the least recently used ones above max_entries."""
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.ttl,))
+            count = conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            if count > self.max_entries:
+                conn.execute("""DELETE FROM responses WHERE key IN (
+                    SELECT key FROM responses ORDER BY last_access ASC LIMIT ?)""", (count - self.max_entries,))
+
+    def clear(self):
+        with self._conn() as conn:
+            conn.execute("DELETE FROM responses")
+
+    def stats(self) -> dict:
+        entries = self._conn().execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "saved_seconds": self.saved_seconds,
+        }
+
+
+_cache: Optional[ResponseCache] = None
+
+
+def configure_cache(path: str = "llm_cache.sqlite", ttl: float = DEFAULT_TTL, max_entries: int = DEFAULT_MAX_ENTRIES) -> ResponseCache:
+    """Turn on response caching for calls made with cache=True."""
+    global _cache
+    _cache = ResponseCache(path, ttl, max_entries)
+    return _cache
+
+
+def disable_cache():
+    global _cache
+    _cache = None
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    return _cache
+
+
+if os.getenv("LLM_CACHE_PATH"):
+    configure_cache(os.environ["LLM_CACHE_PATH"], float(os.getenv("LLM_CACHE_TTL", DEFAULT_TTL)))
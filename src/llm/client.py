@@ -1,34 +1,289 @@
 import os
-from groq import Groq
+import time
+import random
+import asyncio
+import threading
+import weakref
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, Optional
+from groq import Groq, AsyncGroq
 from dotenv import load_dotenv
 import google.generativeai as genai
+from src.llm.cache import get_response_cache, make_key
 
 load_dotenv()
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
-def ask_gemini(prompt:str)-> str:
-    """Send a natural language query to gemini and get back a response."""
+GEMINI_MODEL = "gemini-2.5-flash"
+GROQ_MODEL = "llama-3.1-8b-instant"
 
-    genai.configure(api_key=GEMINI_API_KEY)
-    llm = genai.GenerativeModel("gemini-2.5-flash")
-    response = llm.generate_content(prompt)
+# in-flight requests per provider, shared by every caller in the process
+MAX_CONCURRENCY = {
+    "gemini": int(os.getenv("GEMINI_MAX_CONCURRENCY", "8")),
+    "groq": int(os.getenv("GROQ_MAX_CONCURRENCY", "8")),
+    "fake": 64,
+}
+MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "5"))
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
 
+_lock = threading.Lock()
+_gemini_api_key: Optional[str] = None
+_gemini_models: Dict[str, genai.GenerativeModel] = {}
+_groq_client: Optional[Groq] = None
+# per event loop, dropped with the loop: a new loop never gets a client or semaphore bound to a closed one
+_async_groq_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncGroq]" = weakref.WeakKeyDictionary()
+_sync_limits = {provider: threading.BoundedSemaphore(n) for provider, n in MAX_CONCURRENCY.items()}
+_async_limits: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]]" = weakref.WeakKeyDictionary()
+_fake = None
+
+
+def configure_gemini(api_key: Optional[str] = None):
+    """genai.configure is process-global: do it once per key instead of on every call."""
+    global _gemini_api_key
+    api_key = api_key or GEMINI_API_KEY
+    with _lock:
+        if api_key != _gemini_api_key:
+            genai.configure(api_key=api_key)
+            _gemini_api_key = api_key
+            _gemini_models.clear()
+
+
+def gemini_model(model_name: str = GEMINI_MODEL) -> genai.GenerativeModel:
+    if _gemini_api_key is None:
+        configure_gemini()
+    model = _gemini_models.get(model_name)
+    if model is None:
+        with _lock:
+            model = _gemini_models.setdefault(model_name, genai.GenerativeModel(model_name))
+    return model
+
+
+def groq_client() -> Groq:
+    """Long-lived Groq client: one pooled HTTP connection set for the process. Retries are ours."""
+    global _groq_client
+    if _groq_client is None:
+        with _lock:
+            if _groq_client is None:
+                _groq_client = Groq(api_key=GROQ_API_KEY, max_retries=0)
+    return _groq_client
+
+
+def async_groq_client() -> AsyncGroq:
+    """AsyncGroq's connection pool is bound to an event loop, so keep one client per loop."""
+    loop = asyncio.get_running_loop()
+    client = _async_groq_clients.get(loop)
+    if client is None:
+        with _lock:
+            client = _async_groq_clients.get(loop)
+            if client is None:
+                client = _async_groq_clients[loop] = AsyncGroq(api_key=GROQ_API_KEY, max_retries=0)
+    return client
+
+
+def use_fake_provider(fake=None):
+    """
+    Route every ask_*/aask_*/stream_* call to a local FakeLLM (see src.llm.fake)
+    instead of the network. Pass None to restore the real providers.
+    """
+    global _fake
+    _fake = fake
+    return fake
+
+
+def _status_code(exc: BaseException) -> Optional[int]:
+    for attr in ("status_code", "code", "status"):
+        value = getattr(exc, attr, None)
+        if isinstance(value, int):
+            return value
+    response = getattr(exc, "response", None)
+    return getattr(response, "status_code", None)
+
+
+def is_retryable(exc: BaseException) -> bool:
+    status = _status_code(exc)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    return isinstance(exc, (ConnectionError, TimeoutError)) or type(exc).__name__ in (
+        "APIConnectionError", "APITimeoutError", "ServiceUnavailable", "DeadlineExceeded")
+
+
+def retry_after(exc: BaseException) -> Optional[float]:
+    """Server-requested wait in seconds, from a Retry-After header or the exception itself."""
+    value = getattr(exc, "retry_after", None)
+    headers = getattr(getattr(exc, "response", None), "headers", None)
+    if value is None and headers is not None:
+        value = headers.get("retry-after")
+    try:
+        return max(0.0, float(value)) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, exc: BaseException) -> float:
+    requested = retry_after(exc)
+    if requested is not None:
+        return min(requested, BACKOFF_MAX)
+    # full jitter keeps a burst of callers from retrying in lockstep
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+def call_with_retries(provider: str, call: Callable[[], Any]) -> Any:
+    for attempt in range(MAX_RETRIES + 1):
+        with _sync_limits[provider]:
+            try:
+                return call()
+            except Exception as e:
+                if attempt == MAX_RETRIES or not is_retryable(e):
+                    raise
+                error, delay = e, backoff_delay(attempt, e)
+        print(f"[WARN] {provider} request failed ({_status_code(error) or type(error).__name__}), retrying in {delay:.1f}s")
+        time.sleep(delay)
+
+
+def _async_limit(provider: str) -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    with _lock:
+        limits = _async_limits.get(loop)
+        if limits is None:
+            limits = _async_limits[loop] = {}
+        limit = limits.get(provider)
+        if limit is None:
+            limit = limits[provider] = asyncio.Semaphore(MAX_CONCURRENCY[provider])
+    return limit
+
+
+async def acall_with_retries(provider: str, call: Callable[[], Awaitable[Any]]) -> Any:
+    for attempt in range(MAX_RETRIES + 1):
+        async with _async_limit(provider):
+            try:
+                return await call()
+            except Exception as e:
+                if attempt == MAX_RETRIES or not is_retryable(e):
+                    raise
+                error, delay = e, backoff_delay(attempt, e)
+        print(f"[WARN] {provider} request failed ({_status_code(error) or type(error).__name__}), retrying in {delay:.1f}s")
+        await asyncio.sleep(delay)
+
+
+def _cached(provider: str, model: str, prompt: str, params: dict, cache: bool, call: Callable[[], str],
+            refresh: bool = False) -> str:
+    response_cache = get_response_cache() if cache else None
+    if response_cache is None:
+        return call()
+    if _fake is not None:
+        provider = f"fake:{provider}"
+    key = make_key(provider, model, prompt, params)
+    hit = None if refresh else response_cache.get(key)
+    if hit is not None:
+        return hit
+    start = time.perf_counter()
+    text = call()
+    response_cache.put(key, provider, model, text, time.perf_counter() - start)
+    return text
+
+
+async def _acached(provider: str, model: str, prompt: str, params: dict, cache: bool, call: Callable[[], Awaitable[str]]) -> str:
+    response_cache = get_response_cache() if cache else None
+    if response_cache is None:
+        return await call()
+    if _fake is not None:
+        provider = f"fake:{provider}"
+    key = make_key(provider, model, prompt, params)
+    hit = response_cache.get(key)
+    if hit is not None:
+        return hit
+    start = time.perf_counter()
+    text = await call()
+    response_cache.put(key, provider, model, text, time.perf_counter() - start)
+    return text
+
+
+def _gemini_text(prompt: str, model: str) -> str:
+    if _fake is not None:
+        return call_with_retries("fake", lambda: _fake.complete("gemini", model, prompt)).strip()
+    response = call_with_retries("gemini", lambda: gemini_model(model).generate_content(prompt))
     return response.text.strip()
 
-def ask_groq(prompt:str) -> str:
 
-    client = Groq(api_key=GROQ_API_KEY)
-    
-    response = client.chat.completions.create(
-        model="llama-3.1-8b-instant",
+def _groq_text(prompt: str, model: str, temperature: float, max_tokens: int) -> str:
+    if _fake is not None:
+        return call_with_retries("fake", lambda: _fake.complete("groq", model, prompt)).strip()
+    response = call_with_retries("groq", lambda: groq_client().chat.completions.create(
+        model=model,
         messages=[
             {"role": "user", "content": prompt}
         ],
-        temperature=0.1,
-        max_tokens=1024
-    )
+        temperature=temperature,
+        max_tokens=max_tokens
+    ))
     return response.choices[0].message.content.strip()
 
+
+def ask_gemini(prompt:str, model: str = GEMINI_MODEL, cache: bool = False, refresh: bool = False)-> str:
+    """
+    Send a natural language query to gemini and get back a response.
+    cache: serve byte-identical prompts from the response cache when one is configured.
+    refresh: with cache, skip the cached response and replace it with the new one (e.g. it was malformed).
+    """
+    return _cached("gemini", model, prompt, {}, cache, lambda: _gemini_text(prompt, model), refresh)
+
+def ask_groq(prompt:str, model: str = GROQ_MODEL, temperature: float = 0.1, max_tokens: int = 1024, cache: bool = False) -> str:
+    params = {"temperature": temperature, "max_tokens": max_tokens}
+    return _cached("groq", model, prompt, params, cache, lambda: _groq_text(prompt, model, temperature, max_tokens))
+
+
+def stream_gemini(prompt: str, model: str = GEMINI_MODEL) -> Iterator[str]:
+    """Yield gemini's response text as it is generated. Retries only cover opening the stream."""
+    if _fake is not None:
+        yield from call_with_retries("fake", lambda: _fake.stream("gemini", model, prompt))
+        return
+    response = call_with_retries("gemini", lambda: gemini_model(model).generate_content(prompt, stream=True))
+    with _sync_limits["gemini"]:
+        for chunk in response:
+            if chunk.text:
+                yield chunk.text
+
+
+async def _agemini_text(prompt: str, model: str) -> str:
+    if _fake is not None:
+        return (await acall_with_retries("fake", lambda: _fake.acomplete("gemini", model, prompt))).strip()
+    response = await acall_with_retries("gemini", lambda: gemini_model(model).generate_content_async(prompt))
+    return response.text.strip()
+
+
+async def _agroq_text(prompt: str, model: str, temperature: float, max_tokens: int) -> str:
+    if _fake is not None:
+        return (await acall_with_retries("fake", lambda: _fake.acomplete("groq", model, prompt))).strip()
+    response = await acall_with_retries("groq", lambda: async_groq_client().chat.completions.create(
+        model=model,
+        messages=[{"role": "user", "content": prompt}],
+        temperature=temperature,
+        max_tokens=max_tokens
+    ))
+    return response.choices[0].message.content.strip()
+
+
+async def aask_gemini(prompt: str, model: str = GEMINI_MODEL, cache: bool = False) -> str:
+    return await _acached("gemini", model, prompt, {}, cache, lambda: _agemini_text(prompt, model))
+
+
+async def aask_groq(prompt: str, model: str = GROQ_MODEL, temperature: float = 0.1, max_tokens: int = 1024, cache: bool = False) -> str:
+    params = {"temperature": temperature, "max_tokens": max_tokens}
+    return await _acached("groq", model, prompt, params, cache, lambda: _agroq_text(prompt, model, temperature, max_tokens))
+
+
+async def astream_gemini(prompt: str, model: str = GEMINI_MODEL) -> AsyncIterator[str]:
+    if _fake is not None:
+        for piece in await acall_with_retries("fake", lambda: _fake.acomplete_stream("gemini", model, prompt)):
+            yield piece
+        return
+    response = await acall_with_retries("gemini", lambda: gemini_model(model).generate_content_async(prompt, stream=True))
+    async with _async_limit("gemini"):
+        async for chunk in response:
+            if chunk.text:
+                yield chunk.text
+
 if __name__=="__main__":
-    print(ask_gemini("Explain faiss "))
\ No newline at end of file
+    print(ask_gemini("Explain faiss "))
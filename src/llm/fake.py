@@ -0,0 +1,71 @@
+import time
+import asyncio
+import threading
+from typing import Callable, Dict, List, Optional, Union
+
+
+class FakeRateLimitError(Exception):
+    """Stand-in for a provider 429, carrying the Retry-After the client should honour."""
+
+    status_code = 429
+
+    def __init__(self, retry_after: float = 0.0):
+        super().__init__(f"rate limited, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class FakeLLM:
+    """
+    Local, deterministic LLM provider for tests and offline runs.
+
+    Install it with src.llm.use_fake_provider(FakeLLM(...)); every ask_*,
+    aask_* and stream_* call then goes through the same retry and concurrency
+    layer but is answered here.
+
+    responses: a callable (provider, model, prompt) -> str, or a mapping of
+        prompt substring -> reply; the first matching key wins.
+    default: reply when nothing matches (defaults to echoing the prompt).
+    latency: seconds each call takes.
+    rate_limit_first: raise FakeRateLimitError for the first N calls.
+    """
+
+    def __init__(self, responses: Union[Callable[[str, str, str], str], Dict[str, str], None] = None,
+                 default: Optional[str] = None, latency: float = 0.0, rate_limit_first: int = 0,
+                 retry_after: float = 0.0):
+        self.responses = responses or {}
+        self.default = default
+        self.latency = latency
+        self.rate_limit_first = rate_limit_first
+        self.retry_after = retry_after
+        self.calls: List[dict] = []
+        self._lock = threading.Lock()
+
+    def _reply(self, provider: str, model: str, prompt: str) -> str:
+        with self._lock:
+            self.calls.append({"provider": provider, "model": model, "prompt": prompt})
+            if len(self.calls) <= self.rate_limit_first:
+                raise FakeRateLimitError(self.retry_after)
+        if callable(self.responses):
+            return self.responses(provider, model, prompt)
+        for key, reply in self.responses.items():
+            if key in prompt:
+                return reply
+        return self.default if self.default is not None else prompt
+
+    def complete(self, provider: str, model: str, prompt: str) -> str:
+        if self.latency:
+            time.sleep(self.latency)
+        return self._reply(provider, model, prompt)
+
+    def stream(self, provider: str, model: str, prompt: str) -> List[str]:
+        text = self.complete(provider, model, prompt)
+        return [piece + " " for piece in text.split(" ")[:-1]] + text.split(" ")[-1:]
+
+    async def acomplete(self, provider: str, model: str, prompt: str) -> str:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._reply(provider, model, prompt)
+
+    async def acomplete_stream(self, provider: str, model: str, prompt: str) -> List[str]:
+        text = await self.acomplete(provider, model, prompt)
+        return [piece + " " for piece in text.split(" ")[:-1]] + text.split(" ")[-1:]
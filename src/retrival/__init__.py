@@ -1,4 +1,7 @@
 from .search import RAGSearch
 from .vectorStore import FaissVectorStore
 from .embedding import EmbeddingPipeLine
-from .dataLoader import load_documents
\ No newline at end of file
+from .dataLoader import load_documents
+from .registry import get_embedding_model, get_vector_store, current_vector_store
+from .queryCache import get_query_cache, configure_query_cache
+from .ingest import ingest_files
@@ -0,0 +1,213 @@
+import os
+import re
+import threading
+import numpy as np
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+from src.retrival.registry import current_vector_store, evict_vector_store, register_vector_store
+
+DEFAULT_MEMORY_BUDGET = int(os.getenv("VECTOR_MEMORY_BUDGET_MB", "2048")) * 2**20
+COLLECTION_NAME = re.compile(r"^[A-Za-z0-9_.-]+$")
+
+
+class CollectionRouter:
+    """
+    Named vector store collections (one per course, user, ...) under one root
+    directory, each with its own index and metadata so it can be rebuilt alone.
+
+    Collections are loaded on first use and kept in LRU order; when the
+    indexes loaded together exceed memory_budget bytes the least recently used
+    ones are unloaded (a search already holding one finishes undisturbed).
+    Searches over several collections fan out on a thread pool (Faiss releases
+    the GIL while searching) and the hits are merged by distance.
+    """
+
+    def __init__(self, root: str = "collections", embedding_model: str = "all-MiniLM-L6-v2",
+                 memory_budget: int = DEFAULT_MEMORY_BUDGET, max_workers: Optional[int] = None):
+        """
+        Args:
+            root: directory holding one store directory per collection
+            embedding_model: model shared by every collection (distances must be comparable)
+            memory_budget: bytes of index kept loaded across collections
+            max_workers: fan-out threads (None = one per core)
+        """
+        self.root = root
+        self.embedding_model = embedding_model
+        self.memory_budget = memory_budget
+        self._lock = threading.Lock()
+        self._loaded: "OrderedDict[str, int]" = OrderedDict()  # name -> index bytes, LRU first
+        self._pool = ThreadPoolExecutor(max_workers=max_workers or os.cpu_count() or 1, thread_name_prefix="collection-search")
+
+    def collection_dir(self, name: str) -> str:
+        if not COLLECTION_NAME.match(name):
+            raise ValueError(f"Invalid collection name '{name}'")
+        return os.path.join(self.root, name)
+
+    def list_collections(self) -> List[str]:
+        if not os.path.isdir(self.root):
+            return []
+        from src.retrival.vectorStore import FaissVectorStore
+        return sorted(name for name in os.listdir(self.root)
+                      if FaissVectorStore.store_exists(os.path.join(self.root, name)))
+
+    def get_collection(self, name: str) -> "FaissVectorStore":
+        """The collection's store, loading it (and unloading others over budget) if needed."""
+        from src.retrival.vectorStore import FaissVectorStore
+        persist_dir = self.collection_dir(name)
+        if not FaissVectorStore.store_exists(persist_dir):
+            raise FileNotFoundError(f"No collection '{name}' under {self.root}")
+        store = current_vector_store(persist_dir, self.embedding_model)
+        with self._lock:
+            if name not in self._loaded:
+                self._loaded[name] = store.index_bytes()
+            self._loaded.move_to_end(name)
+            self._enforce_budget(keep=name)
+        return store
+
+    def _enforce_budget(self, keep: str):
+        while sum(self._loaded.values()) > self.memory_budget and len(self._loaded) > 1:
+            name = next(iter(self._loaded))
+            if name == keep:
+                self._loaded.move_to_end(name)
+                continue
+            size = self._loaded.pop(name)
+            evict_vector_store(self.collection_dir(name), self.embedding_model)
+            print(f"[INFO] Unloaded collection '{name}' ({size / 2**20:.1f} MB) to stay within the memory budget")
+
+    def unload(self, name: str):
+        with self._lock:
+            self._loaded.pop(name, None)
+            evict_vector_store(self.collection_dir(name), self.embedding_model)
+
+    def build_collection(self, name: str, documents: List[Any], **store_kwargs: Any) -> "FaissVectorStore":
+        """Upsert documents into one collection only and publish it to readers."""
+        from src.retrival.vectorStore import FaissVectorStore
+        store = FaissVectorStore(self.collection_dir(name), self.embedding_model, **store_kwargs)
+        store.build_from_documents(documents)
+        register_vector_store(store)
+        with self._lock:
+            self._loaded[name] = store.index_bytes()
+            self._loaded.move_to_end(name)
+            self._enforce_budget(keep=name)
+        return store
+
+    def search_batch(self, query_embeddings: Union[np.ndarray, Dict[str, np.ndarray], None], collections: Optional[Iterable[str]] = None,
+                     top_k: int = 10, filters: dict = None, query_texts: List[str] = None,
+                     mode: str = "dense") -> List[List[dict]]:
+        """
+        Search each collection concurrently and merge per query row: by
+        distance, by BM25 score in lexical mode, and in hybrid mode by
+        reciprocal rank fusion of the merged dense and lexical rankings, so an
+        exact-term hit ranks the same as it would in one combined store.
+        Hits are shaped like FaissVectorStore.search_batch plus a "collection" key.
+
+        Args:
+            collections: names to search (None = every collection under root)
+            query_texts: the query strings, needed by the "hybrid" and "lexical" modes
+            query_embeddings: one array for every collection, or {embedding backend: array}; None to
+                              encode query_texts in the fan-out, once per embedding backend met
+            mode: one of vectorStore.SEARCH_MODES
+        """
+        from src.retrival.vectorStore import HYBRID_CANDIDATES, fuse_hits
+        names = list(collections) if collections is not None else self.list_collections()
+        encoded = dict(query_embeddings) if isinstance(query_embeddings, dict) else {}
+        encode_lock = threading.Lock()
+
+        def embeddings_for(store) -> np.ndarray:
+            if query_embeddings is not None and not isinstance(query_embeddings, dict):
+                return query_embeddings
+            # collections are only loaded by search_one, so a tight memory budget never loads one just for its backend
+            with encode_lock:
+                if store.embedding_backend not in encoded:
+                    encoded[store.embedding_backend] = store.embed_queries(query_texts)
+                return encoded[store.embedding_backend]
+
+        if query_texts is not None:
+            n_queries = len(query_texts)
+        else:
+            n_queries = len(next(iter(encoded.values())) if encoded else query_embeddings)
+        candidates = top_k * HYBRID_CANDIDATES if mode == "hybrid" else top_k
+
+        def search_one(name: str):
+            store = self.get_collection(name)
+            dense = lexical = [[] for _ in range(n_queries)]
+            if store.index is not None and store.index.ntotal > 0:
+                if mode != "lexical":
+                    dense = store.search_batch(embeddings_for(store), top_k=candidates, filters=filters)
+                if mode != "dense":
+                    lexical = store.lexical_search_batch(query_texts, top_k=candidates, filters=filters)
+            return name, store, dense, lexical
+
+        stores = {}
+        dense_merged: List[List[dict]] = [[] for _ in range(n_queries)]
+        lexical_merged: List[List[dict]] = [[] for _ in range(n_queries)]
+        for name, store, dense, lexical in self._pool.map(search_one, names):
+            stores[name] = store
+            for row in range(n_queries):
+                dense_merged[row].extend({**hit, "collection": name} for hit in dense[row])
+                lexical_merged[row].extend({**hit, "collection": name} for hit in lexical[row])
+        dense_merged = [sorted(hits, key=lambda hit: float(hit["distance"]))[:candidates] for hits in dense_merged]
+        lexical_merged = [sorted(hits, key=lambda hit: -hit["bm25"])[:candidates] for hits in lexical_merged]
+        if mode == "dense":
+            return dense_merged
+        if mode == "lexical":
+            return lexical_merged
+
+        batch_results = []
+        for row in range(n_queries):
+            results = fuse_hits(dense_merged[row], lexical_merged[row], top_k,
+                                key=lambda hit: (hit["collection"], int(hit["index"])))
+            for name, store in stores.items():
+                hits = [hit for hit in results if hit["collection"] == name]
+                if hits:
+                    store.fill_distances(embeddings_for(store)[row], hits,
+                                         [hit for hit in dense_merged[row] if hit["collection"] == name])
+            batch_results.append(results)
+        return batch_results
+
+    def query(self, query_text: str, collections: Optional[Iterable[str]] = None, top_k: int = 10,
+              filters: dict = None, mode: str = "dense") -> List[dict]:
+        return self.query_batch([query_text], collections, top_k, filters=filters, mode=mode)[0]
+
+    def query_batch(self, query_texts: List[str], collections: Optional[Iterable[str]] = None, top_k: int = 10,
+                    filters: dict = None, mode: str = "dense") -> List[List[dict]]:
+        if not query_texts:
+            return []
+        # queries are encoded inside the fan-out with each collection's backend; lexical searches never encode
+        return self.search_batch(None, collections, top_k, filters, query_texts=query_texts, mode=mode)
+
+    def view(self, collections: Optional[Iterable[str]] = None) -> "CollectionView":
+        return CollectionView(self, None if collections is None else list(collections))
+
+    def close(self):
+        self._pool.shutdown(wait=False)
+
+
+class CollectionView:
+    """A fixed set of collections with the query/query_batch interface of FaissVectorStore, for RAGSearch."""
+
+    def __init__(self, router: CollectionRouter, collections: Optional[List[str]]):
+        self.router = router
+        self.collections = collections
+
+    def query(self, query_text: str, top_k: int = 10, filters: dict = None, mode: str = "dense") -> List[dict]:
+        return self.router.query(query_text, self.collections, top_k, filters, mode)
+
+    def query_batch(self, query_texts: List[str], top_k: int = 10, filters: dict = None,
+                    mode: str = "dense") -> List[List[dict]]:
+        return self.router.query_batch(query_texts, self.collections, top_k, filters, mode)
+
+
+_routers: Dict[tuple, CollectionRouter] = {}
+_routers_lock = threading.Lock()
+
+
+def get_collection_router(root: str = "collections", embedding_model: str = "all-MiniLM-L6-v2") -> CollectionRouter:
+    """Process-wide router per (root, model), so the LRU and memory budget cover every caller."""
+    with _routers_lock:
+        router = _routers.get((root, embedding_model))
+        if router is None:
+            router = _routers[(root, embedding_model)] = CollectionRouter(root, embedding_model)
+        return router
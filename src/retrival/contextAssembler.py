@@ -0,0 +1,162 @@
+import re
+from functools import lru_cache
+from typing import List, Optional
+
+DEFAULT_TOKEN_BUDGET = 1500
+MIN_OVERLAP_CHARS = 20
+NO_RESULTS = "No relevant documents found."
+
+
+CHARS_PER_TOKEN = 4
+
+
+@lru_cache(maxsize=4)
+def _encoding(name: str):
+    import tiktoken
+    try:
+        return tiktoken.get_encoding(name)
+    except Exception as e:
+        # the BPE file is downloaded on first use; offline, fall back to a character estimate
+        print(f"[WARN] tiktoken encoding '{name}' unavailable ({e!r}), estimating {CHARS_PER_TOKEN} chars per token")
+        return None
+
+
+def count_tokens(text: str, encoding: str = "cl100k_base") -> int:
+    enc = _encoding(encoding)
+    if enc is None:
+        return -(-len(text) // CHARS_PER_TOKEN)
+    return len(enc.encode(text, disallowed_special=()))
+
+
+def truncate_tokens(text: str, max_tokens: int, encoding: str = "cl100k_base") -> str:
+    enc = _encoding(encoding)
+    if enc is None:
+        return text[:max_tokens * CHARS_PER_TOKEN]
+    return enc.decode(enc.encode(text, disallowed_special=())[:max_tokens])
+
+
+def _merge_text(a: str, b: str) -> Optional[str]:
+    """a and b joined over their shared overlap (either order), or None when they do not overlap."""
+    if b in a:
+        return a
+    if a in b:
+        return b
+    for first, second in ((a, b), (b, a)):
+        probe = second[:MIN_OVERLAP_CHARS]
+        start = first.find(probe, max(0, len(first) - len(second)))
+        while start != -1:
+            if second.startswith(first[start:]):
+                return first + second[len(first) - start:]
+            start = first.find(probe, start + 1)
+    return None
+
+
+def _shingles(text: str, n: int = 3) -> set:
+    words = re.findall(r"\w+", text.lower())
+    return {tuple(words[i:i + n]) for i in range(max(1, len(words) - n + 1))}
+
+
+def _overlap(a: set, b: set) -> float:
+    # overlap coefficient rather than Jaccard: a short chunk contained in a long segment is a duplicate
+    return len(a & b) / min(len(a), len(b)) if a and b else 0.0
+
+
+def _citation(segment: dict) -> str:
+    label = segment["source"] or "unknown source"
+    if segment["page"] is not None:
+        label += f", p. {segment['page'] + 1}"
+    return label
+
+
+def assemble_context(results: List[dict], token_budget: int = DEFAULT_TOKEN_BUDGET, mmr_lambda: float = 0.7,
+                     duplicate_threshold: float = 0.8, encoding: str = "cl100k_base") -> dict:
+    """
+    Turn search hits into a compact, cited prompt context.
+
+    1. Hits from the same source and page whose texts overlap (the splitter's
+       chunk_overlap) are stitched into one segment.
+    2. Segments are ordered by maximal marginal relevance, trading relevance
+       (from the best hit distance) against redundancy with segments already
+       picked (word-shingle overlap); near-duplicates at or above
+       duplicate_threshold are dropped.
+    3. Segments are packed, each under a "[n] source, p. x" header, until the
+       tiktoken count reaches token_budget.
+
+    Args:
+        results: FaissVectorStore.search/query hits ({"distance", "metadata"}), best first;
+                 "distance" is None for lexical-only hits
+        token_budget: max tokens of the returned context
+        mmr_lambda: 1.0 ranks by relevance only, lower values favour diversity
+        duplicate_threshold: segments at least this similar to a picked one are dropped
+        encoding: tiktoken encoding used to count tokens
+
+    Returns:
+        {"context": str, "citations": [{"ref", "source", "page", "distance"}], "tokens": int}
+    """
+    segments: List[dict] = []
+    for rank, hit in enumerate(results):
+        meta = hit.get("metadata")
+        if not meta or not meta.get("text"):
+            continue
+        distance = hit.get("distance")
+        segment = {"text": meta["text"], "source": meta.get("source"), "page": meta.get("page"),
+                   "distance": None if distance is None else float(distance), "rank": rank}
+        merged = True
+        while merged:
+            merged = False
+            for other in segments:
+                if (other["source"], other["page"]) != (segment["source"], segment["page"]):
+                    continue
+                text = _merge_text(other["text"], segment["text"])
+                if text is not None:
+                    segments.remove(other)
+                    distances = [d for d in (segment["distance"], other["distance"]) if d is not None]
+                    segment = {**segment, "text": text, "distance": min(distances) if distances else None,
+                               "rank": min(segment["rank"], other["rank"])}
+                    merged = True
+                    break
+        segments.append(segment)
+    if not segments:
+        return {"context": NO_RESULTS, "citations": [], "tokens": count_tokens(NO_RESULTS, encoding)}
+
+    for segment in segments:
+        segment["shingles"] = _shingles(segment["text"])
+        if segment["distance"] is not None:
+            # squared L2 between unit vectors is 2 - 2cos: map back to a cosine relevance
+            segment["relevance"] = 1.0 - segment["distance"] / 2.0
+        else:
+            # lexical hits have no distance: relevance falls with their rank
+            segment["relevance"] = 1.0 - segment["rank"] / len(results)
+
+    picked: List[dict] = []
+    remaining = sorted(segments, key=lambda s: s["rank"])
+    while remaining:
+        best, best_score = None, None
+        for segment in remaining:
+            redundancy = max((_overlap(segment["shingles"], p["shingles"]) for p in picked), default=0.0)
+            if redundancy >= duplicate_threshold:
+                continue
+            score = mmr_lambda * segment["relevance"] - (1 - mmr_lambda) * redundancy
+            if best_score is None or score > best_score:
+                best, best_score = segment, score
+        if best is None:
+            break
+        picked.append(best)
+        remaining.remove(best)
+
+    parts, citations, used = [], [], 0
+    for segment in picked:
+        ref = len(citations) + 1
+        part = f"[{ref}] {_citation(segment)}\n{segment['text'].strip()}"
+        tokens = count_tokens(part, encoding) + 2
+        if used + tokens > token_budget:
+            if parts:
+                continue
+            # not even the best segment fits: keep as much of it as the budget allows
+            part = truncate_tokens(part, token_budget, encoding)
+            tokens = token_budget
+        parts.append(part)
+        citations.append({"ref": ref, "source": segment["source"], "page": segment["page"],
+                          "distance": segment["distance"]})
+        used += tokens
+    return {"context": "\n\n".join(parts), "citations": citations, "tokens": used}
@@ -1,63 +1,185 @@
-from typing import List,Any
+from typing import List,Any,Iterator,Iterable,Optional
+import io
 import os
-import tempfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
 
-from langchain_community.document_loaders import (
-    PyMuPDFLoader,
-    UnstructuredPowerPointLoader,
-    TextLoader,
-    Docx2txtLoader
-    )
+from langchain_core.documents import Document
 
 
-def load_documents(uploaded_file)->List[Any]:
+def detect_format(data:bytes)->Optional[str]:
     """
-    Data Loadder for all type of uploaded Documents PPTX,Docs,TXT,PDF.
-    Return a list of langchain Document object.
+    File format from magic bytes rather than the (user supplied) suffix:
+    pdf, docx, pptx or txt; None when unsupported.
     """
-    docs=[]
-
-    for file in uploaded_file:
-
-        file_name=file.name.lower()
-        with tempfile.NamedTemporaryFile(delete=False,suffix=file_name) as tmp:
-            tmp.write(file.read())
-            tmp_path=tmp.name
-        
-        if tmp_path.endswith(".pdf"):
-            try:
-                loader=PyMuPDFLoader(tmp_path)
-            except Exception as e:
-                print(f"[ERROR] Failed to load pdf {tmp_path}: {e}")
-
-        
-        elif tmp_path.endswith(".docx"):
-            try:
-                loader=Docx2txtLoader(tmp_path)
-            except Exception as e:
-                print(f"[ERROR] Failed to load docx {tmp_path}: {e}")
-
-        elif tmp_path.endswith(".pptx"):
-            try:
-                loader=UnstructuredPowerPointLoader(tmp_path)
-            except Exception as e:
-                print(f"[ERROR] Failed to load pptx {tmp_path}: {e}")
-        
-        elif tmp_path.endswith(".txt"):
-            try:
-                loader=TextLoader(tmp_path)
-            except Exception as e:
-                print(f"[ERROR] Failed to load txt {tmp_path}: {e}")
+    if data.startswith(b"%PDF"):
+        return "pdf"
+    if data.startswith(b"PK\x03\x04"):
+        try:
+            names=set(zipfile.ZipFile(io.BytesIO(data)).namelist())
+        except zipfile.BadZipFile:
+            return None
+        if "word/document.xml" in names:
+            return "docx"
+        if "ppt/presentation.xml" in names:
+            return "pptx"
+        return None
+    head=data[:4096]
+    if b"\x00" in head:
+        return None
+    try:
+        head.decode("utf-8")
+    except UnicodeDecodeError as e:
+        # a multi-byte character cut at the 4k boundary is still text
+        if e.start < len(head)-3:
+            return None
+    return "txt"
+
+
+def _iter_pdf(data:bytes,source:str)->Iterator[Document]:
+    import pymupdf
+    with pymupdf.open(stream=data,filetype="pdf") as pdf:
+        for page in pdf:
+            yield Document(page_content=page.get_text(),metadata={
+                "source":source,"page":page.number,"total_pages":pdf.page_count,"file_type":"pdf"})
+
+
+def _iter_docx(data:bytes,source:str)->Iterator[Document]:
+    import docx2txt
+    yield Document(page_content=docx2txt.process(io.BytesIO(data)),metadata={"source":source,"file_type":"docx"})
+
+
+def _shape_texts(shapes)->Iterator[str]:
+    """Text of text frames and tables, descending into grouped shapes."""
+    from pptx.shapes.group import GroupShape
+    for shape in shapes:
+        if isinstance(shape,GroupShape):
+            yield from _shape_texts(shape.shapes)
+        elif shape.has_text_frame:
+            if shape.text_frame.text.strip():
+                yield shape.text_frame.text
+        elif getattr(shape,"has_table",False) and shape.has_table:
+            rows=[" | ".join(cell.text.strip() for cell in row.cells) for row in shape.table.rows]
+            rows=[row for row in rows if row.strip(" |")]
+            if rows:
+                yield "\n".join(rows)
+
+
+def _iter_pptx(data:bytes,source:str)->Iterator[Document]:
+    from pptx import Presentation
+    for number,slide in enumerate(Presentation(io.BytesIO(data)).slides):
+        texts=list(_shape_texts(slide.shapes))
+        if slide.has_notes_slide:
+            notes=slide.notes_slide.notes_text_frame
+            if notes is not None and notes.text.strip():
+                texts.append(f"Notes: {notes.text}")
+        if texts:
+            yield Document(page_content="\n\n".join(texts),metadata={"source":source,"page":number,"file_type":"pptx"})
+
+
+def _iter_txt(data:bytes,source:str)->Iterator[Document]:
+    try:
+        text=data.decode("utf-8")
+    except UnicodeDecodeError:
+        text=data.decode("latin-1")
+    yield Document(page_content=text,metadata={"source":source,"file_type":"txt"})
+
+
+PARSERS={
+    "pdf":_iter_pdf,
+    "docx":_iter_docx,
+    "pptx":_iter_pptx,
+    "txt":_iter_txt,
+}
+
 
+def iter_file_documents(file,data:bytes=None)->Iterator[Any]:
+    """
+    Lazily yield the langchain Document pages of one uploaded file, parsed
+    from memory in the calling process.
+    data: the file's bytes when the caller already read them.
+    """
+    if data is None:
+        data=file.read()
+    file_format=detect_format(data)
+    if file_format is None:
+        print(f"unsupported file {file.name}")
+        return
+    # documents are keyed by the uploaded name so re-uploads upsert in place
+    yield from PARSERS[file_format](data,file.name)
+
+
+def _parse_file(data:bytes,source:str)->dict:
+    """Process-pool worker: parse one file completely and time it."""
+    start=time.perf_counter()
+    file_format=detect_format(data)
+    result={"source":source,"format":file_format,"docs":[],"error":None}
+    if file_format is None:
+        result["error"]="unsupported file format"
+    else:
+        try:
+            result["docs"]=list(PARSERS[file_format](data,source))
+        except Exception as e:
+            result["error"]=repr(e)
+    result["seconds"]=time.perf_counter()-start
+    return result
+
+
+def iter_documents(uploaded_files:Iterable[Any],max_workers:int=None,parse_stats:List[dict]=None)->Iterator[Any]:
+    """
+    Parse uploads in a process pool and yield their Document pages file by
+    file, in completion order, as soon as each file is parsed.
+
+    Args:
+        uploaded_files: file-like objects with .name and .read()
+        max_workers: parser processes (None = one per core, 1 = parse in this process)
+        parse_stats: optional list that receives {source, format, pages, seconds, error} per file
+    """
+    def report(result):
+        stat={"source":result["source"],"format":result["format"],"pages":len(result["docs"]),
+              "seconds":result["seconds"],"error":result["error"]}
+        if parse_stats is not None:
+            parse_stats.append(stat)
+        if result["error"]:
+            print(f"[ERROR] Failed to load {result['source']} ({result['format']}): {result['error']}")
         else:
-            print(f"unsupported file {file_name}")
-            continue
+            print(f"[INFO] Parsed {result['source']} ({result['format']}, {stat['pages']} pages) in {result['seconds']:.2f}s")
 
-        file_docs=loader.load()
+    single=isinstance(uploaded_files,(list,tuple)) and len(uploaded_files)==1
+    if max_workers==1 or single:
+        for file in uploaded_files:
+            result=_parse_file(file.read(),file.name)
+            report(result)
+            yield from result["docs"]
+        return
 
-        docs.extend(file_docs)
+    max_workers=max_workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        pending=set()
+        for file in uploaded_files:
+            # keep only a couple of files per worker in flight so memory stays bounded
+            while len(pending)>=2*max_workers:
+                done,pending=wait(pending,return_when=FIRST_COMPLETED)
+                for future in done:
+                    result=future.result()
+                    report(result)
+                    yield from result["docs"]
+            pending.add(pool.submit(_parse_file,file.read(),file.name))
+        while pending:
+            done,pending=wait(pending,return_when=FIRST_COMPLETED)
+            for future in done:
+                result=future.result()
+                report(result)
+                yield from result["docs"]
 
-        os.remove(tmp_path)
+
+def load_documents(uploaded_file,max_workers:int=None)->List[Any]:
+    """
+    Data Loadder for all type of uploaded Documents PPTX,Docs,TXT,PDF.
+    Return a list of langchain Document object.
+    """
+    docs=list(iter_documents(uploaded_file,max_workers=max_workers))
 
     print(f"Retuning the docs length: {len(docs)}")
 
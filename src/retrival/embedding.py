@@ -1,29 +1,53 @@
-from typing import List,Any
+from typing import List,Any,Optional
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from sentence_transformers import SentenceTransformer
 import numpy as np
+from src.retrival.registry import get_embedding_cache, model_key
+from src.retrival.embeddingEngine import get_embedding_engine
 
 class EmbeddingPipeLine:
-    def __init__(self,model_name:str ="all-MiniLM-L6-v2",chunk_size: int = 400,chunk_overlap:int = 200):
+    def __init__(self,model_name:str ="all-MiniLM-L6-v2",chunk_size: int = 400,chunk_overlap:int = 200,
+                 cache_dir:Optional[str] = "embedding_cache",cache_dtype:str = "float32",
+                 backend:str = "torch",batch_size:int = 64,num_workers:int = 1):
+        """
+        cache_dir: on-disk chunk embedding cache shared by every build with this model (None disables it).
+        cache_dtype: float32, or float16 to halve the cache size.
+        backend / batch_size / num_workers: see EmbeddingEngine (num_workers=0 uses every core).
+        """
         self.chunk_size=chunk_size
         self.chunk_overlap=chunk_overlap
-        self.model=SentenceTransformer(model_name)
-        print(f"[INFO] Loaded embedding model: {model_name}")
+        self.engine=get_embedding_engine(model_name,backend,batch_size,num_workers)
+        self.model=self.engine.model
+        self.cache=get_embedding_cache(cache_dir,model_key(model_name,backend),cache_dtype) if cache_dir else None
 
-    def chunk_documents(self,documents:List[Any])-> List[Any]:
-        splitter = RecursiveCharacterTextSplitter(
+    def text_splitter(self) -> RecursiveCharacterTextSplitter:
+        return RecursiveCharacterTextSplitter(
             chunk_size=self.chunk_size,
             chunk_overlap=self.chunk_overlap,
             length_function=len,
             separators=["\n\n", "\n", " ", ""]
         )
-        chunks = splitter.split_documents(documents)
+
+    def chunk_documents(self,documents:List[Any])-> List[Any]:
+        chunks = self.text_splitter().split_documents(documents)
         print(f"[INFO] Split {len(documents)} documents into {len(chunks)} chunks.")
         return chunks
     
     def embed_chunks(self, chunks: List[Any]) -> np.ndarray:
         texts = [chunk.page_content for chunk in chunks]
-        print(f"[INFO] Generating embeddings for {len(texts)} chunks...")
-        embeddings = self.model.encode(texts, show_progress_bar=True)
+        if self.cache is None:
+            print(f"[INFO] Generating embeddings for {len(texts)} chunks...")
+            embeddings = self.engine.encode(texts, show_progress_bar=True)
+            print(f"[INFO] Embeddings shape: {embeddings.shape}")
+            return embeddings
+
+        cached, digests = self.cache.lookup(texts)
+        missing = [i for i, emb in enumerate(cached) if emb is None]
+        print(f"[INFO] Generating embeddings for {len(missing)} chunks ({len(texts) - len(missing)} from cache)...")
+        if missing:
+            encoded = self.engine.encode([texts[i] for i in missing], show_progress_bar=True)
+            self.cache.append([digests[i] for i in missing], encoded)
+            for i, emb in zip(missing, encoded):
+                cached[i] = emb
+        embeddings = np.vstack(cached).astype('float32') if cached else np.zeros((0, self.model.get_sentence_embedding_dimension()), dtype='float32')
         print(f"[INFO] Embeddings shape: {embeddings.shape}")
         return embeddings
\ No newline at end of file
@@ -0,0 +1,142 @@
+import os
+import re
+import hashlib
+import threading
+import contextlib
+import numpy as np
+from typing import Dict, List, Optional, Sequence, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends are only serialized within the process
+    fcntl = None
+
+DIGEST_SIZE = 20  # sha1
+
+
+def text_digest(text: str) -> bytes:
+    return hashlib.sha1(text.encode("utf-8")).digest()
+
+
+class EmbeddingCache:
+    """
+    Append-only, content-addressed store of chunk embeddings for one model.
+
+    <cache_dir>/<model>/keys.bin holds fixed-width sha1 digests of the chunk
+    texts and vectors.<dtype> the matching rows, both only ever appended to.
+    Rows are read through np.memmap, so a cache shared by many uploads costs
+    page cache rather than per-process memory. Appends take an exclusive file
+    lock and re-read the tail, so several ingestion processes can share a cache;
+    a half-written append (crash) is truncated away on the next open.
+    """
+
+    def __init__(self, cache_dir: str = "embedding_cache", model_name: str = "all-MiniLM-L6-v2", dtype: str = "float32"):
+        if dtype not in ("float32", "float16"):
+            raise ValueError("dtype must be float32 or float16")
+        self.dtype = np.dtype(dtype)
+        self.directory = os.path.join(cache_dir, re.sub(r"[^\w.-]", "_", model_name))
+        os.makedirs(self.directory, exist_ok=True)
+        self.keys_path = os.path.join(self.directory, "keys.bin")
+        self.vectors_path = os.path.join(self.directory, f"vectors.{dtype}")
+        self.dim_path = os.path.join(self.directory, "dim")
+        self.dim: Optional[int] = None
+        self._rows: Dict[bytes, int] = {}
+        self._n_rows = 0
+        self._vectors: Optional[np.memmap] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        with self._file_lock():
+            self._open(repair=True)
+
+    def _open(self, repair: bool = False):
+        """
+        Index rows appended since the last call. Only rows whose key and vector
+        are both complete are used; with repair (caller holds the file lock) a
+        torn tail is truncated so the next append stays aligned.
+        """
+        if self.dim is None and os.path.exists(self.dim_path):
+            with open(self.dim_path) as f:
+                self.dim = int(f.read().strip())
+        if self.dim is None or not os.path.exists(self.keys_path):
+            return
+        known = self._n_rows
+        with open(self.keys_path, "rb") as f:
+            f.seek(known * DIGEST_SIZE)
+            tail = f.read()
+        n_keys = known + len(tail) // DIGEST_SIZE
+        row_bytes = self.dim * self.dtype.itemsize
+        n_rows = os.path.getsize(self.vectors_path) // row_bytes if os.path.exists(self.vectors_path) else 0
+        n = min(n_keys, n_rows)
+        if repair and (n_keys != n or os.path.getsize(self.vectors_path) != n * row_bytes):
+            with open(self.keys_path, "r+b") as f:
+                f.truncate(n * DIGEST_SIZE)
+            with open(self.vectors_path, "r+b") as f:
+                f.truncate(n * row_bytes)
+        for i in range(n - known):
+            self._rows.setdefault(tail[i * DIGEST_SIZE:(i + 1) * DIGEST_SIZE], known + i)
+        if n != known or self._vectors is None:
+            self._map(n)
+        self._n_rows = n
+
+    def _map(self, n_rows: int):
+        self._vectors = np.memmap(self.vectors_path, dtype=self.dtype, mode="r", shape=(n_rows, self.dim)) if n_rows else None
+
+    @contextlib.contextmanager
+    def _file_lock(self):
+        with open(os.path.join(self.directory, "lock"), "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def lookup(self, texts: Sequence[str]) -> Tuple[List[Optional[np.ndarray]], List[bytes]]:
+        """Cached float32 vectors (None for misses) and the digests of texts."""
+        digests = [text_digest(t) for t in texts]
+        found = []
+        with self._lock:
+            for digest in digests:
+                row = self._rows.get(digest)
+                if row is None:
+                    found.append(None)
+                    self.misses += 1
+                else:
+                    found.append(np.asarray(self._vectors[row], dtype='float32'))
+                    self.hits += 1
+        return found, digests
+
+    def append(self, digests: Sequence[bytes], vectors: np.ndarray):
+        vectors = np.asarray(vectors)
+        with self._lock, self._file_lock():
+            # pick up rows appended by other processes before extending the files
+            self._open(repair=True)
+            if self.dim is None:
+                self.dim = int(vectors.shape[1])
+                with open(self.dim_path, "w") as f:
+                    f.write(str(self.dim))
+            new = {}
+            for digest, vector in zip(digests, vectors):
+                if digest not in self._rows and digest not in new:
+                    new[digest] = vector
+            if not new:
+                return
+            # vectors first: a key is only trusted once its row is on disk
+            with open(self.vectors_path, "ab") as f:
+                f.write(np.asarray(list(new.values()), dtype=self.dtype).tobytes())
+            with open(self.keys_path, "ab") as f:
+                f.write(b"".join(new))
+            for i, digest in enumerate(new):
+                self._rows[digest] = self._n_rows + i
+            self._n_rows += len(new)
+            self._map(self._n_rows)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {"entries": len(self._rows), "hits": self.hits, "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0}
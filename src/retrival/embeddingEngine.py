@@ -0,0 +1,94 @@
+import os
+import time
+import atexit
+import threading
+import numpy as np
+from typing import Dict, List, Tuple
+from src.retrival.registry import get_embedding_model
+
+BACKENDS = ("torch", "torch-int8", "onnx", "onnx-int8")
+
+_engines: Dict[Tuple, "EmbeddingEngine"] = {}
+_engines_lock = threading.Lock()
+
+
+class EmbeddingEngine:
+    """
+    CPU-oriented batch encoder for chunk texts.
+
+    Texts are encoded either in-process or fanned out over a
+    sentence-transformers multi-process pool (one worker per core by default);
+    SentenceTransformer.encode already batches by length and returns input
+    order. The backend can be the plain torch
+    model, a dynamically int8-quantized torch model, or ONNX Runtime (fp32 or
+    the int8 export shipped with the model).
+    """
+
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2", backend: str = "torch", batch_size: int = 64,
+                 num_workers: int = 1, min_texts_per_worker: int = 512):
+        """
+        Args:
+            model_name: sentence-transformers model id
+            backend: one of BACKENDS
+            batch_size: texts per forward pass
+            num_workers: encoder processes; 1 encodes in-process, 0 uses every core
+            min_texts_per_worker: below this many texts per worker the pool is not worth starting
+        """
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown embedding backend '{backend}', expected one of {BACKENDS}")
+        self.model_name = model_name
+        self.backend = backend
+        self.batch_size = batch_size
+        if num_workers == 0:
+            num_workers = os.cpu_count() or 1
+        self.num_workers = num_workers
+        self.min_texts_per_worker = min_texts_per_worker
+        self.model = get_embedding_model(model_name, backend)
+        self._pool = None
+        self.last_stats = {}
+
+    def encode(self, texts: List[str], show_progress_bar: bool = False) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.model.get_sentence_embedding_dimension()), dtype='float32')
+        start = time.perf_counter()
+        use_pool = self.num_workers > 1 and len(texts) >= self.num_workers * self.min_texts_per_worker
+        if use_pool:
+            embeddings = self.model.encode(texts, pool=self._get_pool(), batch_size=self.batch_size,
+                                           show_progress_bar=show_progress_bar)
+        else:
+            embeddings = self.model.encode(texts, batch_size=self.batch_size, show_progress_bar=show_progress_bar)
+        embeddings = np.asarray(embeddings, dtype='float32')
+        elapsed = time.perf_counter() - start
+        self.last_stats = {
+            "chunks": len(texts),
+            "seconds": elapsed,
+            "chunks_per_sec": len(texts) / elapsed if elapsed else float("inf"),
+            "workers": self.num_workers if use_pool else 1,
+            "backend": self.backend,
+        }
+        print(f"[INFO] Encoded {len(texts)} chunks in {elapsed:.2f}s "
+              f"({self.last_stats['chunks_per_sec']:.1f} chunks/sec, {self.last_stats['workers']} worker(s), {self.backend})")
+        return embeddings
+
+    def _get_pool(self):
+        if self._pool is None:
+            self._pool = self.model.start_multi_process_pool(target_devices=["cpu"] * self.num_workers)
+            atexit.register(self.close)
+        return self._pool
+
+    def close(self):
+        if self._pool is not None:
+            self.model.stop_multi_process_pool(self._pool)
+            self._pool = None
+
+
+def get_embedding_engine(model_name: str = "all-MiniLM-L6-v2", backend: str = "torch", batch_size: int = 64,
+                         num_workers: int = 1) -> EmbeddingEngine:
+    """Process-wide engine per configuration, so a worker pool is started once and reused across builds."""
+    key = (model_name, backend, batch_size, num_workers)
+    with _engines_lock:
+        engine = _engines.get(key)
+        if engine is None:
+            engine = EmbeddingEngine(model_name, backend, batch_size, num_workers)
+            _engines[key] = engine
+        return engine
@@ -0,0 +1,224 @@
+import math
+import time
+import faiss
+import numpy as np
+from typing import List, Optional, Sequence
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw", "sq8")
+
+# vector counts at which "auto" moves to the next index type
+FLAT_MAX_VECTORS = 50_000
+IVF_FLAT_MAX_VECTORS = 1_000_000
+
+DEFAULT_EF_SEARCH = 64
+HNSW_M = 32
+
+
+def choose_index_type(n_vectors: int) -> str:
+    """
+    Pick an index type for a corpus of n_vectors.
+    Exact flat search while it is cheap, IVF-Flat for mid-sized corpora and
+    IVF-PQ once raw float32 vectors stop fitting comfortably in memory.
+    HNSW and SQ8 are opt-in: HNSW cannot delete in place, which upserts rely on.
+    """
+    if n_vectors < FLAT_MAX_VECTORS:
+        return "flat"
+    if n_vectors < IVF_FLAT_MAX_VECTORS:
+        return "ivf_flat"
+    return "ivf_pq"
+
+
+def ivf_nlist(n_vectors: int) -> int:
+    """Number of IVF cells: ~4*sqrt(n), but with at least 39 training points per cell."""
+    return max(1, min(int(4 * math.sqrt(n_vectors)), n_vectors // 39, 65536))
+
+
+def pq_subquantizers(dim: int) -> int:
+    """Largest divisor of dim giving sub-vectors of at least 8 dimensions."""
+    for m in range(max(1, dim // 8), 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
+
+
+def default_nprobe(nlist: int) -> int:
+    return max(1, min(nlist // 16, 128))
+
+
+def build_index(index_type: str, dim: int, n_vectors: int) -> faiss.Index:
+    """
+    Create an empty index of index_type that accepts add_with_ids.
+    Call train_index on it before adding vectors.
+    """
+    if index_type == "auto":
+        index_type = choose_index_type(n_vectors)
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type '{index_type}', expected one of {INDEX_TYPES} or 'auto'")
+    if index_type in ("ivf_flat", "ivf_pq") and n_vectors < 39:
+        print(f"[WARN] {n_vectors} vectors are too few to train {index_type}, using flat index")
+        index_type = "flat"
+    if index_type == "ivf_pq" and n_vectors < 256:
+        print(f"[WARN] {n_vectors} vectors are too few to train PQ codebooks, using ivf_flat index")
+        index_type = "ivf_flat"
+
+    if index_type == "flat":
+        spec = "IDMap2,Flat"
+    elif index_type == "sq8":
+        spec = "IDMap2,SQ8"
+    elif index_type == "hnsw":
+        spec = f"IDMap2,HNSW{HNSW_M}"
+    elif index_type == "ivf_flat":
+        spec = f"IVF{ivf_nlist(n_vectors)},Flat"
+    else:
+        spec = f"IVF{ivf_nlist(n_vectors)},PQ{pq_subquantizers(dim)}"
+
+    index = faiss.index_factory(dim, spec, faiss.METRIC_L2)
+    print(f"[INFO] Created Faiss index '{spec}' ({index_type}) for {n_vectors} vectors")
+    return index
+
+
+def train_index(index: faiss.Index, vectors: np.ndarray, max_training_points: int = 256 * 1024):
+    if index.is_trained:
+        return
+    if len(vectors) > max_training_points:
+        rng = np.random.default_rng(0)
+        vectors = vectors[rng.choice(len(vectors), max_training_points, replace=False)]
+    start = time.perf_counter()
+    index.train(vectors)
+    print(f"[INFO] Trained index on {len(vectors)} vectors in {time.perf_counter() - start:.2f}s")
+
+
+def index_kind(index: faiss.Index) -> str:
+    index = faiss.downcast_index(index)
+    if isinstance(index, (faiss.IndexIDMap2, faiss.IndexIDMap)):
+        index = faiss.downcast_index(index.index)
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivf_flat"
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexScalarQuantizer):
+        return "sq8"
+    return "flat"
+
+
+def search_parameters(index: faiss.Index, nprobe: Optional[int] = None, ef_search: Optional[int] = None,
+                      selector: Optional[faiss.IDSelector] = None) -> Optional[faiss.SearchParameters]:
+    """
+    Per-call search parameters for index, so nprobe/efSearch can be tuned per query
+    without mutating an index shared between threads. selector restricts the
+    search to the ids it accepts (IndexIDMap translates it to internal ids);
+    the caller must keep it alive for the duration of the search.
+    """
+    kind = index_kind(index)
+    if kind in ("ivf_flat", "ivf_pq"):
+        ivf = faiss.extract_index_ivf(index)
+        params = faiss.SearchParametersIVF(nprobe=nprobe or default_nprobe(ivf.nlist))
+    elif kind == "hnsw":
+        params = faiss.SearchParametersHNSW(efSearch=ef_search or DEFAULT_EF_SEARCH)
+    elif selector is not None:
+        params = faiss.SearchParameters()
+    else:
+        return None
+    if selector is not None:
+        params.sel = selector
+    return params
+
+
+def reconstruct_all(index: faiss.Index):
+    """
+    Return (ids, vectors) stored in index. Vectors of quantized indexes
+    (PQ/SQ) come back approximate.
+    """
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexIVF):
+        invlists = index.invlists
+        ids = np.concatenate([np.zeros(0, dtype='int64')] + [
+            faiss.rev_swig_ptr(invlists.get_ids(l), invlists.list_size(l)).copy()
+            for l in range(index.nlist) if invlists.list_size(l)
+        ])
+        index.set_direct_map_type(faiss.DirectMap.Hashtable)
+        vectors = np.vstack([index.reconstruct(int(i)) for i in ids]) if len(ids) else np.zeros((0, index.d), dtype='float32')
+        return ids, vectors
+    ids = faiss.vector_to_array(index.id_map).astype('int64')
+    vectors = index.index.reconstruct_n(0, index.ntotal)
+    return ids, vectors
+
+
+def recall_latency_report(vectors: np.ndarray, queries: np.ndarray, top_k: int = 10,
+                          index_types: Sequence[str] = INDEX_TYPES,
+                          nprobes: Sequence[int] = (1, 4, 16, 64),
+                          ef_searches: Sequence[int] = (16, 64, 256)) -> List[dict]:
+    """
+    Measure recall@top_k and per-query latency of each index type against the
+    exact flat baseline over the same vectors and queries.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype='float32')
+    queries = np.ascontiguousarray(queries, dtype='float32')
+    ids = np.arange(len(vectors), dtype='int64')
+    dim = vectors.shape[1]
+
+    baseline = build_index("flat", dim, len(vectors))
+    baseline.add_with_ids(vectors, ids)
+    start = time.perf_counter()
+    _, truth = baseline.search(queries, top_k)
+    flat_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    report = [{"index_type": "flat", "param": "-", "recall": 1.0, "ms_per_query": flat_ms}]
+    for index_type in index_types:
+        if index_type == "flat":
+            continue
+        build_start = time.perf_counter()
+        index = build_index(index_type, dim, len(vectors))
+        train_index(index, vectors)
+        index.add_with_ids(vectors, ids)
+        build_s = time.perf_counter() - build_start
+        kind = index_kind(index)
+        if kind.startswith("ivf"):
+            settings = [("nprobe", n, search_parameters(index, nprobe=n)) for n in nprobes]
+        elif kind == "hnsw":
+            settings = [("efSearch", ef, search_parameters(index, ef_search=ef)) for ef in ef_searches]
+        else:
+            settings = [("-", None, None)]
+        for name, value, params in settings:
+            start = time.perf_counter()
+            _, found = index.search(queries, top_k, params=params)
+            ms = (time.perf_counter() - start) * 1000 / len(queries)
+            hits = sum(len(set(f[f >= 0]).intersection(t)) for f, t in zip(found, truth))
+            report.append({
+                "index_type": kind,
+                "param": "-" if value is None else f"{name}={value}",
+                "recall": hits / truth.size,
+                "ms_per_query": ms,
+                "build_s": build_s,
+            })
+    return report
+
+
+def print_report(report: List[dict]):
+    print(f"{'index':<10} {'param':<14} {'recall':>8} {'ms/query':>10}")
+    for row in report:
+        print(f"{row['index_type']:<10} {row['param']:<14} {row['recall']:>8.3f} {row['ms_per_query']:>10.3f}")
+
+
+if __name__=="__main__":
+    import sys
+    if len(sys.argv) > 1:
+        # python -m src.retrival.indexFactory faiss_store : benchmark on a built store's vectors
+        from src.retrival.vectorStore import current_snapshot_dir
+        snapshot_dir = current_snapshot_dir(sys.argv[1])
+        if snapshot_dir is None:
+            raise SystemExit(f"No saved store in {sys.argv[1]}")
+        index = faiss.read_index(f"{snapshot_dir}/faiss.index")
+        if index_kind(index) != "flat":
+            raise SystemExit("Benchmark needs a store built with the flat index type")
+        _, data = reconstruct_all(index)
+    else:
+        rng = np.random.default_rng(0)
+        centers = rng.standard_normal((200, 384)).astype('float32')
+        data = centers[rng.integers(0, 200, 100_000)] + 0.3 * rng.standard_normal((100_000, 384)).astype('float32')
+    rng = np.random.default_rng(1)
+    picks = rng.choice(len(data), min(500, len(data)), replace=False)
+    queries = data[picks] + 0.05 * rng.standard_normal((len(picks), data.shape[1])).astype('float32')
+    print_report(recall_latency_report(data, queries))
@@ -0,0 +1,278 @@
+import os
+import json
+import time
+import queue
+import hashlib
+import threading
+import numpy as np
+from typing import Any, Dict, Iterable, List
+
+from src.retrival.dataLoader import iter_file_documents
+from src.retrival.embedding import EmbeddingPipeLine
+from src.retrival.vectorStore import FaissVectorStore, chunk_vector_id
+from src.retrival.indexFactory import build_index, train_index
+from src.retrival.registry import register_vector_store
+
+CHECKPOINT_FILE = "ingest_checkpoint.json"
+_DONE = ("done",)
+
+
+class _StageFailed(Exception):
+    pass
+
+
+class IngestCheckpoint:
+    """
+    Sources (by uploaded name and content sha1) whose chunks are already
+    persisted in the store. Written only right after the store is saved, so a
+    crash mid-ingest resumes from the last saved file; removed once a run completes.
+    """
+
+    def __init__(self, persist_dir: str):
+        self.path = os.path.join(persist_dir, CHECKPOINT_FILE)
+        self.completed: Dict[str, str] = {}
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.completed = json.load(f)["completed"]
+
+    def is_done(self, source: str, digest: str) -> bool:
+        return self.completed.get(source) == digest
+
+    def mark(self, source: str, digest: str):
+        self.completed[source] = digest
+
+    def flush(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"completed": self.completed}, f)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def _put(q: queue.Queue, item: Any, stop: threading.Event) -> bool:
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _get(q: queue.Queue, stop: threading.Event) -> Any:
+    while not stop.is_set():
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            continue
+    return _DONE
+
+
+def _run_stage(work, outbox: queue.Queue, stop: threading.Event, errors: List[BaseException]):
+    try:
+        work()
+    except BaseException as e:
+        errors.append(e)
+        stop.set()
+    finally:
+        _put(outbox, _DONE, stop)
+
+
+def ingest_files(uploaded_files: Iterable[Any], store: FaissVectorStore, batch_size: int = 256,
+                 queue_size: int = 4, save_every_files: int = 50, save_every_seconds: float = 300.0,
+                 min_train_vectors: int = 20000) -> dict:
+    """
+    Stream uploads into store: load -> chunk -> embed -> add, one thread per
+    stage with bounded queues in between, so parsing, encoding and index
+    insertion overlap and only a few pages / chunk batches are in memory at
+    a time whatever the upload size.
+
+    Each file is upserted as a unit: new chunks are added, chunks that
+    disappeared from the source are removed. The store and the checkpoint are
+    saved after save_every_files completed files or save_every_seconds,
+    whichever comes first (each save writes a full snapshot, so saving after
+    every file would cost O(files x corpus) I/O); rerunning with the same
+    files after a crash skips the ones already saved. A file that fails to
+    parse is logged and counted in stats["failed_files"] and the run goes on;
+    it is not checkpointed, so the next run tries it again.
+
+    Args:
+        uploaded_files: file-like objects with .name and .read()
+        store: target vector store (loaded from disk first if it exists)
+        batch_size: chunks per embedding batch
+        queue_size: max batches in flight between two stages
+        save_every_files: persist store + checkpoint after this many files
+        save_every_seconds: ... or once this much time has passed since the last save
+        min_train_vectors: vectors buffered to train an IVF/PQ/SQ index on a fresh store
+
+    Returns:
+        Ingestion stats
+    """
+    start = time.perf_counter()
+    if store.index is None and store.exists():
+        store.load()
+    checkpoint = IngestCheckpoint(store.persist_dir)
+    emb_pipe = EmbeddingPipeLine(model_name=store.embedding_model, chunk_size=store.chunk_size,
+                                 chunk_overlap=store.chunk_overlap, cache_dir=store.embedding_cache_dir,
+                                 backend=store.embedding_backend, batch_size=store.embed_batch_size,
+                                 num_workers=store.embed_workers)
+    splitter = emb_pipe.text_splitter()
+
+    stop = threading.Event()
+    errors: List[BaseException] = []
+    docs_q, chunks_q, vectors_q = (queue.Queue(maxsize=queue_size) for _ in range(3))
+    stats = {"files": 0, "skipped_files": 0, "failed_files": 0, "pages": 0, "chunks": 0, "embedded": 0, "removed": 0}
+
+    def load_stage():
+        for file in uploaded_files:
+            data = file.read()
+            source, digest = file.name, hashlib.sha1(data).hexdigest()
+            if checkpoint.is_done(source, digest):
+                print(f"[INFO] Skipping {source}: already ingested (checkpoint)")
+                stats["skipped_files"] += 1
+                continue
+            try:
+                for doc in iter_file_documents(file, data):
+                    stats["pages"] += 1
+                    if not _put(docs_q, ("doc", source, doc), stop):
+                        return
+            except Exception as e:
+                print(f"[ERROR] Failed to load {source}: {e!r}")
+                stats["failed_files"] += 1
+                if not _put(docs_q, ("failed", source, None), stop):
+                    return
+                continue
+            if not _put(docs_q, ("end", source, digest), stop):
+                return
+
+    def chunk_stage():
+        buffer = []
+        while True:
+            msg = _get(docs_q, stop)
+            if msg is _DONE:
+                return
+            if msg[0] == "doc":
+                buffer.extend(splitter.split_documents([msg[2]]))
+                while len(buffer) >= batch_size:
+                    if not _put(chunks_q, ("chunks", msg[1], buffer[:batch_size]), stop):
+                        return
+                    buffer = buffer[batch_size:]
+            else:
+                if buffer and not _put(chunks_q, ("chunks", msg[1], buffer), stop):
+                    return
+                buffer = []
+                if not _put(chunks_q, msg, stop):
+                    return
+
+    def embed_stage():
+        while True:
+            msg = _get(chunks_q, stop)
+            if msg is _DONE:
+                return
+            if msg[0] == "chunks":
+                _, source, chunks = msg
+                ids = [chunk_vector_id(source, chunk.page_content) for chunk in chunks]
+                # unchanged chunks of a re-uploaded file are already indexed: don't encode them again
+                new_rows = [row for row, vid in enumerate(ids) if vid not in store.metadata]
+                embeddings = np.asarray(emb_pipe.embed_chunks([chunks[r] for r in new_rows]), dtype='float32')
+                msg = ("vectors", source, chunks, ids, new_rows, embeddings)
+            if not _put(vectors_q, msg, stop):
+                return
+
+    threads = [
+        threading.Thread(target=_run_stage, args=(load_stage, docs_q, stop, errors), name="ingest-load", daemon=True),
+        threading.Thread(target=_run_stage, args=(chunk_stage, chunks_q, stop, errors), name="ingest-chunk", daemon=True),
+        threading.Thread(target=_run_stage, args=(embed_stage, vectors_q, stop, errors), name="ingest-embed", daemon=True),
+    ]
+    for thread in threads:
+        thread.start()
+
+    seen: Dict[str, set] = {}
+    deferred: List[tuple] = []
+    files_since_save = 0
+    last_save = time.monotonic()
+
+    def add(msg):
+        nonlocal files_since_save, last_save
+        if msg[0] == "vectors":
+            _, source, chunks, ids, new_rows, embeddings = msg
+            source_seen = seen.setdefault(source, set())
+            keep, keep_ids = [], []
+            for i, row in enumerate(new_rows):
+                # the same text twice in one source maps to one id
+                if ids[row] not in source_seen and ids[row] not in store.metadata:
+                    keep.append(i)
+                    keep_ids.append(ids[row])
+                    source_seen.add(ids[row])
+            source_seen.update(ids)
+            stats["chunks"] += len(chunks)
+            if keep:
+                metadatas = [FaissVectorStore._chunk_metadata(chunks[new_rows[i]], vid) for i, vid in zip(keep, keep_ids)]
+                store.add_embeddings(embeddings[keep], metadatas, ids=keep_ids)
+                stats["embedded"] += len(keep)
+        elif msg[0] == "failed":
+            # pages parsed before the error stay indexed, but the old chunks are not pruned and
+            # the file is not checkpointed: the next run upserts it again
+            seen.pop(msg[1], None)
+        else:
+            _, source, digest = msg
+            stale = store.metadata.ids_for_source(source) - seen.pop(source, set())
+            stats["removed"] += store.remove_ids(stale)
+            checkpoint.mark(source, digest)
+            stats["files"] += 1
+            files_since_save += 1
+            due = files_since_save >= save_every_files or time.monotonic() - last_save >= save_every_seconds
+            if due and store.index is not None:
+                store.save()
+                checkpoint.flush()
+                files_since_save = 0
+                last_save = time.monotonic()
+
+    def flush_deferred():
+        vectors = [m[5] for m in deferred if m[0] == "vectors" and len(m[5])]
+        if vectors and store.index is None:
+            training = np.vstack(vectors)
+            store.index = build_index(store.index_type, training.shape[1], len(training))
+            train_index(store.index, training)
+        for m in deferred:
+            add(m)
+        deferred.clear()
+
+    needs_training = store.index is None and store.index_type not in ("auto", "flat")
+    try:
+        while True:
+            msg = _get(vectors_q, stop)
+            if msg is _DONE:
+                break
+            if needs_training:
+                # IVF/PQ/SQ quantizers need a representative sample before the first add
+                deferred.append(msg)
+                if sum(len(m[5]) for m in deferred if m[0] == "vectors") >= min_train_vectors:
+                    flush_deferred()
+                    needs_training = False
+                continue
+            add(msg)
+        if errors:
+            # keep the files completed so far, so a rerun resumes after them
+            if store.index is not None:
+                store.save()
+                checkpoint.flush()
+            raise _StageFailed(f"ingestion stage failed: {errors[0]!r}") from errors[0]
+        flush_deferred()
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+    if store.index is not None:
+        store.maybe_migrate_index()
+        store.save()
+        register_vector_store(store)
+    checkpoint.clear()
+    stats["seconds"] = time.perf_counter() - start
+    print(f"[INFO] Ingested {stats['files']} files ({stats['skipped_files']} skipped, {stats['failed_files']} failed), "
+          f"{stats['chunks']} chunks, {stats['embedded']} embedded, {stats['removed']} removed in {stats['seconds']:.1f}s")
+    return stats
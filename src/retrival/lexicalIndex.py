@@ -0,0 +1,234 @@
+import os
+import re
+import json
+import math
+import numpy as np
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+FILES = {
+    "doc_ids": "bm25_doc_ids.npy",
+    "lengths": "bm25_doc_lengths.npy",
+    "offsets": "bm25_offsets.npy",
+    "docs": "bm25_postings.npy",
+    "tfs": "bm25_tfs.npy",
+    "terms": "bm25_terms.json",
+}
+
+# words, keeping section numbers and formula names ("3.2.1", "x-ray", "newton's") in one token
+TOKEN = re.compile(r"\w+(?:[.\-']\w+)*")
+STOPWORDS = frozenset("""a an and are as at be but by for from has have in is it its of on or that the this
+to was were which with""".split())
+MAX_TF = np.iinfo(np.uint16).max
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in TOKEN.findall(text.lower()) if t not in STOPWORDS]
+
+
+class BM25Index:
+    """
+    BM25 inverted index over chunk texts, keyed by Faiss vector id.
+
+    On disk: sorted doc ids with their token counts, one postings run per
+    term (doc row + term frequency) addressed through an offsets column, and
+    the term list. Opening maps the columns, like ChunkMetadataStore; adds and
+    removes go to an in-memory overlay until save() writes a merged set.
+    """
+
+    def __init__(self, directory: Optional[str] = None, k1: float = 1.2, b: float = 0.75):
+        self.directory = directory
+        self.k1 = k1
+        self.b = b
+        self._doc_ids = np.zeros(0, dtype='int64')
+        self._lengths = np.zeros(0, dtype='int32')
+        self._offsets = np.zeros(1, dtype='int64')
+        self._docs = np.zeros(0, dtype='int32')
+        self._tfs = np.zeros(0, dtype='uint16')
+        self._terms: Dict[str, int] = {}
+        self._dead: Optional[np.ndarray] = None  # base rows removed since the last save
+        self._added: Dict[int, Counter] = {}
+        self._added_postings: Dict[str, Dict[int, int]] = {}
+        if directory is not None and self.exists(directory):
+            self._open(directory)
+        self._n_docs = len(self._doc_ids)
+        self._total_length = int(np.asarray(self._lengths).sum())
+
+    @staticmethod
+    def exists(directory: str) -> bool:
+        return os.path.exists(os.path.join(directory, FILES["terms"]))
+
+    @classmethod
+    def from_metadata(cls, metadata) -> "BM25Index":
+        """Index every chunk of a ChunkMetadataStore (stores saved before the lexical index existed)."""
+        index = cls()
+        for vid, meta in metadata.items():
+            index.add(vid, meta.get("text", ""))
+        return index
+
+    def _open(self, directory: str):
+        path = lambda name: os.path.join(directory, FILES[name])
+        with open(path("terms"), "r", encoding="utf-8") as f:
+            self._terms = {term: i for i, term in enumerate(json.load(f))}
+        for name in ("doc_ids", "lengths", "offsets", "docs", "tfs"):
+            setattr(self, f"_{name}", np.load(path(name), mmap_mode="r"))
+
+    def __len__(self) -> int:
+        return self._n_docs
+
+    def _base_row(self, vid: int) -> int:
+        row = int(np.searchsorted(self._doc_ids, vid))
+        if row < len(self._doc_ids) and self._doc_ids[row] == vid and (self._dead is None or not self._dead[row]):
+            return row
+        return -1
+
+    def add(self, vid: int, text: str):
+        vid = int(vid)
+        self.remove(vid)
+        counts = Counter(tokenize(text))
+        self._added[vid] = counts
+        for term, tf in counts.items():
+            self._added_postings.setdefault(term, {})[vid] = tf
+        self._n_docs += 1
+        self._total_length += sum(counts.values())
+
+    def remove(self, vid: int):
+        vid = int(vid)
+        counts = self._added.pop(vid, None)
+        if counts is not None:
+            for term in counts:
+                postings = self._added_postings[term]
+                del postings[vid]
+                if not postings:
+                    del self._added_postings[term]
+            self._n_docs -= 1
+            self._total_length -= sum(counts.values())
+            return
+        row = self._base_row(vid)
+        if row >= 0:
+            if self._dead is None:
+                self._dead = np.zeros(len(self._doc_ids), dtype=bool)
+            self._dead[row] = True
+            self._n_docs -= 1
+            self._total_length -= int(self._lengths[row])
+
+    def search(self, query_text: str, top_k: int = 10, allowed: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        """
+        (vector id, BM25 score) of the top_k best matching chunks, best first.
+        allowed: only these vector ids may be returned (None = all).
+        """
+        terms = set(tokenize(query_text))
+        if not terms or not self._n_docs:
+            return []
+        avg_length = self._total_length / self._n_docs
+        ids, scores = [], []
+        for term in terms:
+            term_ids, tfs, lengths = [], [], []
+            t = self._terms.get(term)
+            if t is not None:
+                start, end = int(self._offsets[t]), int(self._offsets[t + 1])
+                rows = np.asarray(self._docs[start:end])
+                keep = slice(None) if self._dead is None else ~self._dead[rows]
+                rows = rows[keep]
+                term_ids.append(np.asarray(self._doc_ids)[rows])
+                tfs.append(np.asarray(self._tfs[start:end])[keep].astype('float32'))
+                lengths.append(np.asarray(self._lengths)[rows].astype('float32'))
+            added = self._added_postings.get(term)
+            if added:
+                term_ids.append(np.fromiter(added.keys(), dtype='int64', count=len(added)))
+                tfs.append(np.fromiter(added.values(), dtype='float32', count=len(added)))
+                lengths.append(np.array([sum(self._added[vid].values()) for vid in added], dtype='float32'))
+            if not term_ids:
+                continue
+            term_ids, tfs, lengths = np.concatenate(term_ids), np.concatenate(tfs), np.concatenate(lengths)
+            df = len(term_ids)
+            if not df:
+                continue
+            idf = math.log(1 + (self._n_docs - df + 0.5) / (df + 0.5))
+            ids.append(term_ids)
+            scores.append(idf * tfs * (self.k1 + 1) / (tfs + self.k1 * (1 - self.b + self.b * lengths / avg_length)))
+        if not ids:
+            return []
+        ids, scores = np.concatenate(ids), np.concatenate(scores)
+        if allowed is not None:
+            keep = np.isin(ids, allowed)
+            ids, scores = ids[keep], scores[keep]
+        unique_ids, inverse = np.unique(ids, return_inverse=True)
+        totals = np.bincount(inverse, weights=scores)
+        best = np.argsort(-totals, kind="stable")[:top_k]
+        return [(int(unique_ids[i]), float(totals[i])) for i in best]
+
+    def save(self, directory: Optional[str] = None):
+        """Write the live base postings plus the overlay as a fresh column set, then re-map it."""
+        directory = directory or self.directory
+        os.makedirs(directory, exist_ok=True)
+
+        n_base = len(self._doc_ids)
+        live = np.ones(n_base, dtype=bool) if self._dead is None else ~self._dead
+        vocabulary = [None] * len(self._terms)
+        for term, i in self._terms.items():
+            vocabulary[i] = term
+        term_codes = dict(self._terms)
+
+        base_terms = np.repeat(np.arange(len(vocabulary), dtype='int64'), np.diff(np.asarray(self._offsets)))
+        base_rows = np.asarray(self._docs)
+        keep = live[base_rows]
+        posting_terms = [base_terms[keep]]
+        posting_ids = [np.asarray(self._doc_ids)[base_rows[keep]]]
+        posting_tfs = [np.asarray(self._tfs)[keep].astype('int64')]
+        added = sorted(self._added.items())
+        for vid, counts in added:
+            for term in counts:
+                if term not in term_codes:
+                    term_codes[term] = len(vocabulary)
+                    vocabulary.append(term)
+            posting_terms.append(np.fromiter((term_codes[t] for t in counts), dtype='int64', count=len(counts)))
+            posting_ids.append(np.full(len(counts), vid, dtype='int64'))
+            posting_tfs.append(np.fromiter(counts.values(), dtype='int64', count=len(counts)))
+        posting_terms, posting_ids = np.concatenate(posting_terms), np.concatenate(posting_ids)
+        posting_tfs = np.minimum(np.concatenate(posting_tfs), MAX_TF).astype('uint16')
+
+        doc_ids = np.concatenate([np.asarray(self._doc_ids)[live], np.array([vid for vid, _ in added], dtype='int64')])
+        lengths = np.concatenate([np.asarray(self._lengths)[live], np.array(
+            [sum(counts.values()) for _, counts in added], dtype='int32')])
+        order = np.argsort(doc_ids, kind="stable")
+        doc_ids, lengths = doc_ids[order], lengths[order]
+
+        # drop terms left without postings and renumber the rest
+        used = np.unique(posting_terms)
+        remap = np.full(len(vocabulary), -1, dtype='int64')
+        remap[used] = np.arange(len(used))
+        posting_terms = remap[posting_terms]
+        by_term = np.lexsort((posting_ids, posting_terms))
+        docs = np.searchsorted(doc_ids, posting_ids[by_term]).astype('int32')
+        offsets = np.concatenate([np.zeros(1, dtype='int64'),
+                                  np.cumsum(np.bincount(posting_terms, minlength=len(used)))]).astype('int64')
+
+        path = lambda name: os.path.join(directory, FILES[name])
+        tmp = lambda name: path(name) + ".tmp"
+        for name, array in (("doc_ids", doc_ids), ("lengths", lengths), ("offsets", offsets),
+                            ("docs", docs), ("tfs", posting_tfs[by_term])):
+            with open(tmp(name), "wb") as f:
+                np.save(f, array)
+        with open(tmp("terms"), "w", encoding="utf-8") as f:
+            json.dump([vocabulary[i] for i in used.tolist()], f, ensure_ascii=False)
+        # the term list goes last: its presence marks a complete set
+        for name in FILES:
+            os.replace(tmp(name), path(name))
+
+        self.directory = directory
+        self._dead = None
+        self._added.clear()
+        self._added_postings.clear()
+        self._open(directory)
+        self._n_docs = len(self._doc_ids)
+        self._total_length = int(np.asarray(self._lengths).sum())
+
+
+def reciprocal_rank_fusion(rankings: List[List[int]], k: int = 60) -> List[Tuple[int, float]]:
+    """Fuse ranked id lists: each id scores sum(1 / (k + rank)) over the lists it appears in; best first."""
+    scores: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, vid in enumerate(ranking, 1):
+            scores[vid] = scores.get(vid, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: -item[1])
@@ -0,0 +1,235 @@
+import os
+import json
+import mmap
+import numpy as np
+from typing import Any, Dict, Iterator, List, Optional, Set
+
+FILES = {
+    "ids": "meta_ids.npy",
+    "offsets": "meta_text_offsets.npy",
+    "text": "meta_text.bin",
+    "pages": "meta_pages.npy",
+    "sources": "meta_source_codes.npy",
+    "file_types": "meta_file_type_codes.npy",
+    "hashes": "meta_hashes.npy",
+    "dictionary": "meta_dictionary.json",
+}
+
+
+class ChunkMetadataStore:
+    """
+    Columnar, memory-mapped chunk metadata keyed by Faiss vector id.
+
+    On disk: sorted ids, page / source / file_type / content-hash columns and a
+    UTF-8 text blob addressed through an offsets column. Opening only maps the
+    files, so load time and resident memory no longer grow with the corpus and
+    worker processes share the same pages; a lookup decodes just the rows asked for.
+    Writes go to an in-memory overlay until save().
+    """
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory
+        self._ids = np.zeros(0, dtype='int64')
+        self._offsets = np.zeros(1, dtype='int64')
+        self._pages = np.zeros(0, dtype='int32')
+        self._source_codes = np.zeros(0, dtype='int32')
+        self._file_type_codes = np.zeros(0, dtype='int32')
+        self._hashes = np.zeros(0, dtype='S40')
+        self._text = b""
+        self._sources: List[Any] = []
+        self._file_types: List[Any] = []
+        self._added: Dict[int, dict] = {}
+        self._deleted: Set[int] = set()
+        if directory is not None and self.exists(directory):
+            self._open(directory)
+
+    @staticmethod
+    def exists(directory: str) -> bool:
+        return os.path.exists(os.path.join(directory, FILES["dictionary"]))
+
+    def _open(self, directory: str):
+        path = lambda name: os.path.join(directory, FILES[name])
+        with open(path("dictionary"), "r", encoding="utf-8") as f:
+            dictionary = json.load(f)
+        self._sources = dictionary["sources"]
+        self._file_types = dictionary["file_types"]
+        self._ids = np.load(path("ids"), mmap_mode="r")
+        self._offsets = np.load(path("offsets"), mmap_mode="r")
+        self._pages = np.load(path("pages"), mmap_mode="r")
+        self._source_codes = np.load(path("sources"), mmap_mode="r")
+        self._file_type_codes = np.load(path("file_types"), mmap_mode="r")
+        self._hashes = np.load(path("hashes"), mmap_mode="r")
+        self._text = b""
+        if os.path.getsize(path("text")):
+            with open(path("text"), "rb") as f:
+                self._text = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _row(self, vid: int) -> int:
+        pos = int(np.searchsorted(self._ids, vid))
+        if pos < len(self._ids) and self._ids[pos] == vid:
+            return pos
+        return -1
+
+    def _read_row(self, row: int) -> dict:
+        page = int(self._pages[row])
+        return {
+            "text": self._text[int(self._offsets[row]):int(self._offsets[row + 1])].decode("utf-8"),
+            "source": self._sources[self._source_codes[row]],
+            "page": None if page < 0 else page,
+            "chunk_id": int(self._ids[row]),
+            "content_hash": self._hashes[row].decode("ascii") or None,
+            "file_type": self._file_types[self._file_type_codes[row]],
+        }
+
+    def get(self, vid: int, default: Any = None) -> Optional[dict]:
+        vid = int(vid)
+        if vid in self._added:
+            return self._added[vid]
+        if vid in self._deleted:
+            return default
+        row = self._row(vid)
+        return self._read_row(row) if row >= 0 else default
+
+    def __contains__(self, vid: int) -> bool:
+        vid = int(vid)
+        if vid in self._added:
+            return True
+        return vid not in self._deleted and self._row(vid) >= 0
+
+    def __setitem__(self, vid: int, meta: dict):
+        vid = int(vid)
+        self._added[vid] = meta
+        self._deleted.discard(vid)
+
+    def pop(self, vid: int) -> dict:
+        meta = self.get(vid)
+        if meta is None:
+            raise KeyError(vid)
+        self._added.pop(int(vid), None)
+        if self._row(int(vid)) >= 0:
+            self._deleted.add(int(vid))
+        return meta
+
+    def __len__(self) -> int:
+        return len(self._ids) - len(self._deleted) + sum(1 for vid in self._added if self._row(vid) < 0)
+
+    def ids(self) -> np.ndarray:
+        base = self._ids
+        if self._deleted or self._added:
+            drop = np.fromiter(self._deleted.union(self._added), dtype='int64')
+            base = base[~np.isin(base, drop)]
+        return np.concatenate([base, np.fromiter(self._added, dtype='int64', count=len(self._added))])
+
+    def ids_for_source(self, source: Any) -> Set[int]:
+        """Ids of every chunk of source, from the source column without touching any text."""
+        ids = set()
+        if source in self._sources:
+            code = self._sources.index(source)
+            ids.update(self._ids[np.asarray(self._source_codes) == code].tolist())
+            ids.difference_update(self._deleted)
+        ids.difference_update(vid for vid, meta in self._added.items() if meta.get("source") != source)
+        ids.update(vid for vid, meta in self._added.items() if meta.get("source") == source)
+        return ids
+
+    def ids_matching(self, sources: Optional[Set[Any]] = None, file_types: Optional[Set[Any]] = None,
+                     page_range: Optional[tuple] = None) -> np.ndarray:
+        """
+        Ids of the chunks whose source and file_type are in the given sets and
+        whose page lies in the inclusive (first, last) range; None means no
+        constraint. Evaluated on the code columns, no text is read.
+        """
+        def matches(meta: dict) -> bool:
+            page = meta.get("page")
+            return ((sources is None or meta.get("source") in sources)
+                    and (file_types is None or meta.get("file_type") in file_types)
+                    and (page_range is None or (page is not None and page_range[0] <= page <= page_range[1])))
+
+        mask = np.ones(len(self._ids), dtype=bool)
+        if sources is not None:
+            mask &= np.isin(self._source_codes, [code for code, s in enumerate(self._sources) if s in sources])
+        if file_types is not None:
+            mask &= np.isin(self._file_type_codes, [code for code, t in enumerate(self._file_types) if t in file_types])
+        if page_range is not None:
+            pages = np.asarray(self._pages)
+            mask &= (pages >= page_range[0]) & (pages <= page_range[1])
+        base = np.asarray(self._ids)[mask]
+        if self._deleted or self._added:
+            base = base[~np.isin(base, np.fromiter(self._deleted.union(self._added), dtype='int64'))]
+        added = [vid for vid, meta in self._added.items() if matches(meta)]
+        return np.concatenate([base, np.array(added, dtype='int64')])
+
+    def sources(self) -> Set[Any]:
+        return {self._sources[code] for code in np.unique(np.asarray(self._source_codes))} | {m.get("source") for m in self._added.values()}
+
+    def items(self) -> Iterator:
+        for vid in self.ids().tolist():
+            yield vid, self.get(vid)
+
+    def save(self, directory: Optional[str] = None):
+        """Write base rows minus deletions plus the overlay as a fresh columnar set, then re-map it."""
+        directory = directory or self.directory
+        os.makedirs(directory, exist_ok=True)
+
+        keep = np.ones(len(self._ids), dtype=bool)
+        if self._deleted or self._added:
+            keep = ~np.isin(self._ids, np.fromiter(self._deleted.union(self._added), dtype='int64'))
+        rows = np.nonzero(keep)[0]
+
+        sources, file_types = {}, {}
+        code = lambda table, value: table.setdefault(value, len(table))
+        base_source_codes = np.asarray(self._source_codes)[rows]
+        base_file_type_codes = np.asarray(self._file_type_codes)[rows]
+        source_remap = np.array([code(sources, s) for s in self._sources] or [0], dtype='int32')
+        file_type_remap = np.array([code(file_types, t) for t in self._file_types] or [0], dtype='int32')
+
+        added = sorted(self._added.items())
+        ids = np.concatenate([np.asarray(self._ids)[rows], np.array([vid for vid, _ in added], dtype='int64')])
+        pages = np.concatenate([np.asarray(self._pages)[rows], np.array(
+            [-1 if m.get("page") is None else int(m["page"]) for _, m in added], dtype='int32')])
+        source_codes = np.concatenate([source_remap[base_source_codes], np.array(
+            [code(sources, m.get("source")) for _, m in added], dtype='int32')])
+        file_type_codes = np.concatenate([file_type_remap[base_file_type_codes], np.array(
+            [code(file_types, m.get("file_type")) for _, m in added], dtype='int32')])
+        hashes = np.concatenate([np.asarray(self._hashes)[rows], np.array(
+            [(m.get("content_hash") or "").encode("ascii") for _, m in added], dtype='S40')])
+
+        # only the overlay's texts are held in memory; base rows are streamed from the old blob below
+        added_texts = [m.get("text", "").encode("utf-8") for _, m in added]
+        base_offsets = np.asarray(self._offsets)
+        lengths = np.concatenate([(base_offsets[rows + 1] - base_offsets[rows]).astype('int64'),
+                                  np.fromiter((len(t) for t in added_texts), dtype='int64', count=len(added_texts))])
+        order = np.argsort(ids, kind="stable")
+        offsets = np.concatenate([np.zeros(1, dtype='int64'), np.cumsum(lengths[order])])
+
+        path = lambda name: os.path.join(directory, FILES[name])
+        tmp = lambda name: path(name) + ".tmp"
+        for name, array in (("ids", ids[order]), ("offsets", offsets), ("pages", pages[order]),
+                            ("sources", source_codes[order]), ("file_types", file_type_codes[order]),
+                            ("hashes", hashes[order])):
+            with open(tmp(name), "wb") as f:
+                np.save(f, array)
+        with open(tmp("text"), "wb", buffering=1 << 20) as f:
+            n_base = len(rows)
+            for i in order.tolist():
+                if i < n_base:
+                    r = int(rows[i])
+                    f.write(self._text[int(base_offsets[r]):int(base_offsets[r + 1])])
+                else:
+                    f.write(added_texts[i - n_base])
+        with open(tmp("dictionary"), "w", encoding="utf-8") as f:
+            json.dump({"sources": list(sources), "file_types": list(file_types)}, f)
+        # the dictionary goes last: its presence marks a complete set
+        for name in FILES:
+            os.replace(tmp(name), path(name))
+
+        self.directory = directory
+        self._added.clear()
+        self._deleted.clear()
+        self._open(directory)
+
+    @classmethod
+    def from_dict(cls, metadata: Dict[int, dict]) -> "ChunkMetadataStore":
+        store = cls()
+        for vid, meta in metadata.items():
+            store[vid] = meta
+        return store
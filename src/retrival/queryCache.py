@@ -0,0 +1,132 @@
+import os
+import re
+import atexit
+import pickle
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+import numpy as np
+
+
+def normalize_query(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+class LRUCache:
+    """Thread-safe bounded LRU mapping with hit/miss counters."""
+
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: Hashable, value: Any):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+class QueryCache:
+    """
+    Two-level cache in front of FaissVectorStore.query:
+    query embeddings keyed by (model name, normalized text), and top-k results
+    keyed by (store, index version, normalized text, search params). Every
+    mutation of a store bumps its version, so stale results are never served
+    and simply age out of the LRU.
+    """
+
+    def __init__(self, max_embeddings: int = 4096, max_results: int = 4096, persist_path: Optional[str] = None):
+        self.embeddings = LRUCache(max_embeddings)
+        self.results = LRUCache(max_results)
+        self.persist_path = persist_path
+        if persist_path and os.path.exists(persist_path):
+            self.load(persist_path)
+
+    def get_embedding(self, model_name: str, text: str) -> Optional[np.ndarray]:
+        return self.embeddings.get((model_name, normalize_query(text)))
+
+    def put_embedding(self, model_name: str, text: str, embedding: np.ndarray):
+        self.embeddings.put((model_name, normalize_query(text)), embedding)
+
+    def get_results(self, store_key: Hashable, version: int, text: str, *params) -> Optional[list]:
+        return self.results.get((store_key, version, normalize_query(text)) + params)
+
+    def put_results(self, store_key: Hashable, version: int, text: str, results: list, *params):
+        self.results.put((store_key, version, normalize_query(text)) + params, results)
+
+    def stats(self) -> dict:
+        return {"embeddings": self.embeddings.stats(), "results": self.results.stats()}
+
+    def clear(self):
+        self.embeddings.clear()
+        self.results.clear()
+
+    def save(self, path: Optional[str] = None):
+        """Persist the embedding level; results are tied to in-process index versions and are not saved."""
+        path = path or self.persist_path
+        if not path:
+            return
+        with self.embeddings._lock:
+            items = list(self.embeddings._data.items())
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(items, f)
+        os.replace(tmp_path, path)
+        print(f"[INFO] Saved {len(items)} cached query embeddings to {path}")
+
+    def load(self, path: str):
+        with open(path, "rb") as f:
+            items = pickle.load(f)
+        for key, embedding in items[-self.embeddings.maxsize:]:
+            self.embeddings.put(key, embedding)
+        print(f"[INFO] Loaded {len(items)} cached query embeddings from {path}")
+
+
+query_cache = QueryCache()
+
+
+def configure_query_cache(max_embeddings: int = 4096, max_results: int = 4096, persist_path: Optional[str] = None) -> QueryCache:
+    """Replace the process-wide cache; with persist_path the embeddings are reloaded now and saved at exit."""
+    global query_cache
+    query_cache = QueryCache(max_embeddings, max_results, persist_path)
+    if persist_path:
+        atexit.register(query_cache.save)
+    return query_cache
+
+
+def get_query_cache() -> QueryCache:
+    return query_cache
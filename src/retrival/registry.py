@@ -0,0 +1,166 @@
+import os
+import time
+import threading
+from typing import Dict, Tuple
+from sentence_transformers import SentenceTransformer
+
+# int8 ONNX export published alongside the sentence-transformers models (AVX2 kernels)
+ONNX_INT8_FILE = "onnx/model_quint8_avx2.onnx"
+
+_lock = threading.RLock()
+_models: Dict[Tuple[str, str], SentenceTransformer] = {}
+_stores: Dict[Tuple[str, str], "FaissVectorStore"] = {}
+_embedding_caches: Dict[Tuple[str, str, str], "EmbeddingCache"] = {}
+_last_checked: Dict[Tuple[str, str], float] = {}
+_reloading: Dict[Tuple[str, str], object] = {}  # key -> token of the reload in flight
+
+# how often readers look for a newer snapshot (seconds)
+RELOAD_INTERVAL = float(os.getenv("VECTOR_STORE_RELOAD_INTERVAL", "2"))
+
+
+def get_embedding_model(model_name: str = "all-MiniLM-L6-v2", backend: str = "torch") -> SentenceTransformer:
+    """
+    Return the process-wide SentenceTransformer for (model_name, backend), loading it once.
+    backend: "torch", "torch-int8" (dynamically quantized Linear layers), "onnx"
+    or "onnx-int8" (ONNX Runtime with the model's quantized export).
+    """
+    key = (model_name, backend)
+    model = _models.get(key)
+    if model is not None:
+        return model
+    with _lock:
+        model = _models.get(key)
+        if model is None:
+            model = _load_model(model_name, backend)
+            _models[key] = model
+            print(f"[INFO] Loaded embedding model: {model_name} ({backend})")
+        return model
+
+
+def model_key(model_name: str, backend: str = "torch") -> str:
+    """Cache namespace for embeddings of (model_name, backend): quantized backends give slightly different vectors."""
+    return model_name if backend == "torch" else f"{model_name}@{backend}"
+
+
+def _require_onnx(backend: str):
+    try:
+        import onnxruntime  # noqa: F401
+        import optimum  # noqa: F401
+    except ImportError as e:
+        raise ImportError(f"The '{backend}' embedding backend needs ONNX Runtime and optimum: "
+                          f"pip install 'smart-campus-assistant[onnx]' (or 'sentence-transformers[onnx]')") from e
+
+
+def _load_model(model_name: str, backend: str) -> SentenceTransformer:
+    if backend == "torch":
+        return SentenceTransformer(model_name)
+    if backend == "torch-int8":
+        import torch
+        model = SentenceTransformer(model_name, device="cpu")
+        return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    if backend in ("onnx", "onnx-int8"):
+        _require_onnx(backend)
+    if backend == "onnx":
+        return SentenceTransformer(model_name, backend="onnx")
+    if backend == "onnx-int8":
+        return SentenceTransformer(model_name, backend="onnx", model_kwargs={"file_name": ONNX_INT8_FILE})
+    raise ValueError(f"Unknown embedding backend '{backend}'")
+
+
+def get_embedding_cache(cache_dir: str, model_name: str = "all-MiniLM-L6-v2", dtype: str = "float32") -> "EmbeddingCache":
+    """Return the process-wide on-disk chunk embedding cache for (cache_dir, model_name, dtype)."""
+    key = (cache_dir, model_name, dtype)
+    with _lock:
+        cache = _embedding_caches.get(key)
+        if cache is None:
+            from src.retrival.embeddingCache import EmbeddingCache
+            cache = EmbeddingCache(cache_dir, model_name, dtype)
+            _embedding_caches[key] = cache
+        return cache
+
+
+def get_vector_store(persist_dir: str = "faiss_store", embedding_model: str = "all-MiniLM-L6-v2") -> "FaissVectorStore":
+    """
+    Return the process-wide FaissVectorStore for (embedding_model, persist_dir),
+    loading the current snapshot from disk on first use. The index is mmapped,
+    so worker processes serving the same snapshot share its pages.
+    """
+    key = (embedding_model, persist_dir)
+    store = _stores.get(key)
+    if store is not None:
+        return store
+    with _lock:
+        store = _stores.get(key)
+        if store is None:
+            from src.retrival.vectorStore import FaissVectorStore
+            store = FaissVectorStore(persist_dir, embedding_model)
+            store.load(mmap=True)
+            _stores[key] = store
+        return store
+
+
+def current_vector_store(persist_dir: str = "faiss_store", embedding_model: str = "all-MiniLM-L6-v2") -> "FaissVectorStore":
+    """
+    get_vector_store for long-running readers: at most every RELOAD_INTERVAL
+    seconds it checks whether another save moved the store's CURRENT snapshot
+    and, if so, loads the new snapshot on a background thread and swaps it in.
+    Until then (and for queries already running) the old store keeps serving.
+    """
+    store = get_vector_store(persist_dir, embedding_model)
+    key = (embedding_model, persist_dir)
+    now = time.monotonic()
+    if now - _last_checked.get(key, 0.0) < RELOAD_INTERVAL:
+        return store
+    _last_checked[key] = now
+    if store.snapshot_dir is None or store.is_current():
+        return store
+    with _lock:
+        if key in _reloading:
+            return store
+        token = _reloading[key] = object()
+    threading.Thread(target=_reload_vector_store, args=(persist_dir, embedding_model, token),
+                     name="vector-store-reload", daemon=True).start()
+    return store
+
+
+def _reload_vector_store(persist_dir: str, embedding_model: str, token: object):
+    key = (embedding_model, persist_dir)
+    try:
+        from src.retrival.vectorStore import FaissVectorStore
+        store = FaissVectorStore(persist_dir, embedding_model)
+        store.load(mmap=True)
+        with _lock:
+            # evicted or cleared meanwhile: don't republish a store the caller just dropped
+            if _reloading.get(key) is not token or key not in _stores:
+                return
+            _stores[key] = store
+        print(f"[INFO] Swapped in vector store snapshot {store.snapshot_dir}")
+    except Exception as e:
+        # e.g. a snapshot pruned between reading CURRENT and loading it: retry on the next check
+        print(f"[WARN] Reloading vector store {persist_dir} failed: {e!r}")
+    finally:
+        with _lock:
+            if _reloading.get(key) is token:
+                del _reloading[key]
+
+
+def register_vector_store(store: "FaissVectorStore"):
+    """Publish an already built/loaded store so readers pick it up instead of a stale copy."""
+    with _lock:
+        _stores[(store.embedding_model, store.persist_dir)] = store
+
+
+def evict_vector_store(persist_dir: str, embedding_model: str = "all-MiniLM-L6-v2"):
+    """Drop the cached store so the next get_vector_store re-reads it from disk."""
+    with _lock:
+        _stores.pop((embedding_model, persist_dir), None)
+        _reloading.pop((embedding_model, persist_dir), None)
+
+
+def clear():
+    with _lock:
+        _stores.clear()
+        _last_checked.clear()
+        _reloading.clear()
+        _models.clear()
+        _embedding_caches.clear()
@@ -1,18 +1,82 @@
-from src.retrival.vectorStore import FaissVectorStore
+import os
+from typing import List, Optional, Tuple, Union
+from src.retrival.registry import current_vector_store
+from src.retrival.contextAssembler import DEFAULT_TOKEN_BUDGET, assemble_context
+
+# see vectorStore.SEARCH_MODES; set RETRIEVAL_MODE=hybrid to opt every caller in to hybrid retrieval
+DEFAULT_SEARCH_MODE = os.getenv("RETRIEVAL_MODE", "dense")
 
 class RAGSearch:
-    def __init__(self, persist_dir: str = "faiss_store", embedding_model: str = "all-MiniLM-L6-v2"):
-        self.vectorstore = FaissVectorStore(persist_dir, embedding_model)
-        self.vectorstore.load()
-        print("[INFO] VDB is loaded")
-
-    def search(self, query: str, top_k: int = 5) -> str:
-        results = self.vectorstore.query(query, top_k=top_k)
-        texts = [r["metadata"].get("text", "") for r in results if r["metadata"]]
-        context = "\n\n".join(texts)
-        if not context:
-            return "No relevant documents found."
-        return context
+    def __init__(self, persist_dir: str = "faiss_store", embedding_model: str = "all-MiniLM-L6-v2",
+                 token_budget: int = DEFAULT_TOKEN_BUDGET, mmr_lambda: float = 0.7,
+                 collections: Optional[Union[List[str], str]] = None, collections_root: str = "collections",
+                 mode: str = DEFAULT_SEARCH_MODE):
+        """
+        token_budget: max tokens of the context handed to the LLM (see assemble_context)
+        mmr_lambda: relevance vs. diversity trade-off when picking chunks
+        collections: search these named collections under collections_root ("all" for every one)
+                     through the shared CollectionRouter instead of the single persist_dir store
+        mode: "dense", "hybrid" (dense + BM25 fused by RRF) or "lexical" (BM25 only, no embedding
+              model call: for keyword lookups); every search method can override it per call
+        """
+        if collections is not None:
+            from src.retrival.collectionRouter import get_collection_router
+            router = get_collection_router(collections_root, embedding_model)
+            self._view = router.view(None if collections == "all" else collections)
+        else:
+            self._view = None
+            # shared per process: the model and index are loaded once, not per request
+            current_vector_store(persist_dir, embedding_model)
+        self.persist_dir = persist_dir
+        self.embedding_model = embedding_model
+        self.token_budget = token_budget
+        self.mmr_lambda = mmr_lambda
+        self.mode = mode
+
+    @property
+    def vectorstore(self):
+        """The store to query now: a newer saved snapshot is picked up without restarting."""
+        if self._view is not None:
+            return self._view
+        return current_vector_store(self.persist_dir, self.embedding_model)
+
+    def search(self, query: str, top_k: int = 5, filters: dict = None, mode: str = None) -> str:
+        """
+        Context for query from the top_k best chunks.
+        filters: optional scope, e.g. {"source": "physics.pdf", "page_range": (10, 20)}; see vectorStore.filter_spec
+        """
+        results = self.vectorstore.query(query, top_k=top_k, filters=filters, mode=mode or self.mode)
+        return self._to_context(results)
+
+    def search_with_scores(self, query: str, top_k: int = 5, filters: dict = None, mode: str = None) -> Tuple[str, List[float]]:
+        """
+        Context plus the L2 distance of each hit (smaller = closer), in rank order.
+        Lexical-only searches have no distances and return an empty list.
+        """
+        results = self.vectorstore.query(query, top_k=top_k, filters=filters, mode=mode or self.mode)
+        return self._to_context(results), self._distances(results)
+
+    def search_many(self, queries: List[str], top_k: int = 5, filters: dict = None, mode: str = None) -> List[str]:
+        """Batched search: one encode call and one index search for all queries, one context per query."""
+        batch_results = self.vectorstore.query_batch(queries, top_k=top_k, filters=filters, mode=mode or self.mode)
+        return [self._to_context(results) for results in batch_results]
+
+    def search_many_with_scores(self, queries: List[str], top_k: int = 5, filters: dict = None, mode: str = None) -> List[Tuple[str, List[float]]]:
+        """search_many, with each context's hit distances as in search_with_scores."""
+        batch_results = self.vectorstore.query_batch(queries, top_k=top_k, filters=filters, mode=mode or self.mode)
+        return [(self._to_context(results), self._distances(results))
+                for results in batch_results]
+
+    def assemble(self, query: str, top_k: int = 5, filters: dict = None, mode: str = None) -> dict:
+        """Deduplicated, cited, token-budgeted context: {"context", "citations", "tokens"}."""
+        return assemble_context(self.vectorstore.query(query, top_k=top_k, filters=filters, mode=mode or self.mode), self.token_budget, self.mmr_lambda)
+
+    @staticmethod
+    def _distances(results) -> List[float]:
+        return [float(r["distance"]) for r in results if r["metadata"] and r["distance"] is not None]
+
+    def _to_context(self, results) -> str:
+        return assemble_context(results, self.token_budget, self.mmr_lambda)["context"]
        
 if __name__=="__main__":
     search=RAGSearch()
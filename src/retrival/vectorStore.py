@@ -1,78 +1,579 @@
 import os
+import re
+import json
+import time
+import shutil
+import hashlib
+import itertools
 import faiss
 import numpy as np
 import pickle
-from typing import List, Any
-from sentence_transformers import SentenceTransformer
+from collections import defaultdict, OrderedDict
+from typing import List, Any, Iterable, Optional
 from src.retrival.embedding import EmbeddingPipeLine
+from src.retrival.registry import get_embedding_model, register_vector_store, model_key
+from src.retrival.metadataStore import ChunkMetadataStore, FILES as METADATA_FILES
+from src.retrival.queryCache import get_query_cache
+from src.retrival.lexicalIndex import BM25Index, reciprocal_rank_fusion
+from src.retrival.indexFactory import (
+    build_index, train_index, choose_index_type, index_kind, search_parameters, reconstruct_all
+)
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def chunk_vector_id(source: Any, text: str) -> int:
+    """Stable 63-bit Faiss id for a chunk, derived from its source and content hash."""
+    digest = hashlib.sha1(f"{source}\0{content_hash(text)}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") & 0x7FFFFFFFFFFFFFFF
+
+
+# the original loader indexed a temp copy of each upload: <tmpdir>/tmpXXXXXXXX<lower-cased file name>
+LEGACY_TEMP_SOURCE = re.compile(r"^tmp[a-z0-9_]{8}(.+)$")
+
+
+def legacy_upload_name(source: Any) -> Any:
+    """The uploaded file name behind a temp-copy source of a pre-migration store; other sources unchanged."""
+    if not isinstance(source, str) or not os.path.isabs(source):
+        return source
+    match = LEGACY_TEMP_SOURCE.match(os.path.basename(source))
+    return match.group(1) if match else source
+
+
+# process-wide so two store instances never share a version number
+_next_version = itertools.count(1).__next__
+
+FILTER_KEYS = ("source", "file_type", "page_range")
+
+CURRENT_FILE = "CURRENT"
+MANIFEST_FILE = "store.json"
+SNAPSHOTS_DIR = "snapshots"
+KEEP_SNAPSHOTS = 3
+_next_snapshot = itertools.count(1).__next__
+
+# "dense": embeddings only, "lexical": BM25 only (no embedding model call), "hybrid": both fused by RRF
+SEARCH_MODES = ("dense", "hybrid", "lexical")
+RRF_K = 60
+HYBRID_CANDIDATES = 4  # each ranking contributes top_k * HYBRID_CANDIDATES candidates to the fusion
+
+
+def current_snapshot_dir(persist_dir: str) -> Optional[str]:
+    """
+    Directory holding the store's live snapshot: the one named in CURRENT, or
+    persist_dir itself for a store saved before snapshots; None when nothing is saved.
+    """
+    try:
+        with open(os.path.join(persist_dir, CURRENT_FILE), "r", encoding="utf-8") as f:
+            return os.path.join(persist_dir, SNAPSHOTS_DIR, f.read().strip())
+    except FileNotFoundError:
+        return persist_dir if os.path.exists(os.path.join(persist_dir, "faiss.index")) else None
+
+
+def read_index(path: str, mmap: bool = False):
+    """
+    Read a Faiss index; with mmap the vector data is mapped read-only instead of
+    copied, so worker processes serving the same snapshot share its pages.
+    Returns (index, mapped). Index types that cannot be mapped are read normally.
+    """
+    if mmap:
+        flags = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+        try:
+            return faiss.read_index(path, flags), True
+        except RuntimeError as e:
+            print(f"[WARN] Could not mmap {path} ({e}), reading it into memory")
+    return faiss.read_index(path), False
+
+
+def fuse_hits(dense_hits: List[dict], lexical_hits: List[dict], top_k: int, key=lambda hit: int(hit["index"])) -> List[dict]:
+    """
+    Reciprocal rank fusion of a dense and a lexical ranking of hits, best first.
+    Hits carry "rrf" and, when matched lexically, "bm25"; hits found only
+    lexically have "distance" None (see FaissVectorStore.fill_distances).
+    key: identity of a hit across both rankings
+    """
+    hits = {key(hit): dict(hit) for hit in dense_hits}
+    for hit in lexical_hits:
+        hits.setdefault(key(hit), {**hit, "distance": None})["bm25"] = hit["bm25"]
+    fused = reciprocal_rank_fusion([[key(hit) for hit in dense_hits], [key(hit) for hit in lexical_hits]], RRF_K)
+    return [{**hits[k], "rrf": score} for k, score in fused[:top_k]]
+
+
+def filter_spec(filters: Optional[dict]) -> Optional[tuple]:
+    """
+    Normalise a search filter to a hashable (sources, file_types, page_range).
+
+    filters: {"source": name or names, "file_type": type or types,
+              "page_range": (first, last) inclusive, 0-based as stored}; None = no filter.
+    """
+    if not filters:
+        return None
+    unknown = set(filters) - set(FILTER_KEYS)
+    if unknown:
+        raise ValueError(f"Unknown search filter(s) {sorted(unknown)}, expected {FILTER_KEYS}")
+    as_set = lambda value: None if value is None else frozenset([value] if isinstance(value, str) else value)
+    page_range = filters.get("page_range")
+    return (as_set(filters.get("source")), as_set(filters.get("file_type")),
+            None if page_range is None else (int(page_range[0]), int(page_range[1])))
+
 
 class FaissVectorStore:
-    def __init__(self, persist_dir: str = "faiss_store", embedding_model: str = "all-MiniLM-L6-v2", chunk_size: int = 400, chunk_overlap: int = 200):
+    def __init__(self, persist_dir: str = "faiss_store", embedding_model: str = "all-MiniLM-L6-v2", chunk_size: int = 400, chunk_overlap: int = 200,
+                 index_type: str = "auto", nprobe: int = None, ef_search: int = None, embedding_cache_dir: str = "embedding_cache",
+                 embedding_backend: str = "torch", embed_batch_size: int = 64, embed_workers: int = 1):
+        """
+        index_type: one of indexFactory.INDEX_TYPES, or "auto" to choose from the vector count.
+        nprobe / ef_search: default query-time IVF / HNSW search breadth (None = factory default).
+        embedding_cache_dir: content-addressed chunk embedding cache used when building (None disables it).
+        embedding_backend / embed_batch_size / embed_workers: chunk encoder settings, see EmbeddingEngine.
+        """
         self.persist_dir = persist_dir
         os.makedirs(self.persist_dir, exist_ok=True)
         self.index = None
-        self.metadata = []
+        self.metadata = ChunkMetadataStore()
+        self.lexical = BM25Index()
         self.embedding_model = embedding_model
-        self.model = SentenceTransformer(embedding_model)
+        self.embedding_backend = embedding_backend
+        self.embed_batch_size = embed_batch_size
+        self.embed_workers = embed_workers
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
-        print(f"[INFO] Loaded embedding model: {embedding_model}")
+        self.index_type = index_type
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+        self.embedding_cache_dir = embedding_cache_dir
+        # bumped on every add/remove/rebuild/load/save; query results are cached per version
+        self.version = _next_version()
+        self._selectors: "OrderedDict[tuple, Any]" = OrderedDict()
+        # directory of the snapshot this store was loaded from / last saved to
+        self.snapshot_dir: Optional[str] = None
+        self._mapped = False
+
+    @property
+    def model(self):
+        # loaded on first use, so lexical-only readers never load it; queries go
+        # through the same backend as chunks so both land in the same vector space
+        return get_embedding_model(self.embedding_model, self.embedding_backend)
 
     def build_from_documents(self, documents: List[Any]):
+        """
+        Upsert documents into the store and persist it. Only chunks whose
+        (source, content hash) is not already indexed get embedded.
+        """
         print(f"[INFO] Building vector store from {len(documents)} raw documents...")
-        emb_pipe = EmbeddingPipeLine(model_name=self.embedding_model, chunk_size=self.chunk_size, chunk_overlap=self.chunk_overlap)
-        chunks = emb_pipe.chunk_documents(documents)
-        embeddings = emb_pipe.embed_chunks(chunks)
-        metadatas = [{
-            "text": chunk.page_content,
-            "source": chunk.metadata.get("source"),
-            "page": chunk.metadata.get("page", None),
-            "chunk_id": i,
-            "file_type": chunk.metadata.get("file_type")
-        } for i, chunk in enumerate(chunks)]
-
-        self.add_embeddings(np.array(embeddings).astype('float32'), metadatas)
+        if self.index is None and self.exists():
+            self.load()
+        self.upsert_documents(documents)
+        self.maybe_migrate_index()
         self.save()
+        register_vector_store(self)
         print(f"[INFO] Vector store built and saved to {self.persist_dir}")
 
-    def add_embeddings(self, embeddings: np.ndarray, metadatas: List[Any] = None):
+    def upsert_documents(self, documents: List[Any]):
+        """
+        Replace the indexed chunks of every source present in documents.
+        Unchanged chunks keep their vectors; removed chunks are deleted.
+        """
+        emb_pipe = EmbeddingPipeLine(model_name=self.embedding_model, chunk_size=self.chunk_size, chunk_overlap=self.chunk_overlap,
+                                     cache_dir=self.embedding_cache_dir, backend=self.embedding_backend,
+                                     batch_size=self.embed_batch_size, num_workers=self.embed_workers)
+        chunks = emb_pipe.chunk_documents(documents)
+
+        by_source = defaultdict(dict)
+        for chunk in chunks:
+            source = chunk.metadata.get("source")
+            by_source[source][chunk_vector_id(source, chunk.page_content)] = chunk
+
+        new_chunks, new_ids, stale_ids = [], [], []
+        for source, chunk_by_id in by_source.items():
+            existing = self.metadata.ids_for_source(source)
+            stale_ids.extend(existing.difference(chunk_by_id))
+            for vid, chunk in chunk_by_id.items():
+                if vid not in existing:
+                    new_ids.append(vid)
+                    new_chunks.append(chunk)
+
+        self.remove_ids(stale_ids)
+        if new_chunks:
+            embeddings = emb_pipe.embed_chunks(new_chunks)
+            metadatas = [self._chunk_metadata(chunk, vid) for chunk, vid in zip(new_chunks, new_ids)]
+            self.add_embeddings(np.array(embeddings).astype('float32'), metadatas, ids=new_ids)
+        kept = len(chunks) - len(new_chunks)
+        print(f"[INFO] Upserted {len(by_source)} sources: {len(new_chunks)} new chunks embedded, {kept} unchanged, {len(stale_ids)} removed.")
+
+    def delete_sources(self, sources: Iterable[Any]) -> int:
+        """Remove every chunk of the given sources. Returns the number of vectors removed."""
+        ids = []
+        for source in sources:
+            ids.extend(self.metadata.ids_for_source(source))
+        return self.remove_ids(ids)
+
+    def _ensure_writable(self):
+        """
+        A read-only mmapped index must be copied into memory before it is
+        modified; copied from the mapping, since another process may already
+        have pruned the snapshot directory it came from. (clone_index would
+        keep viewing the mapped vectors, so the copy goes through serialization.)
+        """
+        if self._mapped and self.index is not None:
+            self.index, self._mapped = faiss.deserialize_index(faiss.serialize_index(self.index)), False
+
+    def add_embeddings(self, embeddings: np.ndarray, metadatas: List[Any] = None, ids: List[int] = None):
         dim = embeddings.shape[1]
+        self._ensure_writable()
         if self.index is None:
-            self.index = faiss.IndexFlatL2(dim)
-        self.index.add(embeddings)
-        if metadatas:
-            self.metadata.extend(metadatas)
+            self.index = build_index(self.index_type, dim, embeddings.shape[0])
+            train_index(self.index, embeddings)
+        if ids is None:
+            if not metadatas:
+                raise ValueError("add_embeddings needs either ids or metadatas to derive ids from")
+            ids = [chunk_vector_id(m.get("source"), m.get("text", "")) for m in metadatas]
+        ids = np.asarray(ids, dtype='int64')
+        self.index.add_with_ids(embeddings, ids)
+        for i, vid in enumerate(ids.tolist()):
+            meta = dict(metadatas[i]) if metadatas else {}
+            meta["chunk_id"] = vid
+            self.metadata[vid] = meta
+            self.lexical.add(vid, meta.get("text", ""))
+        self.version = _next_version()
         print(f"[INFO] Added {embeddings.shape[0]} vectors to Faiss index.")
 
+    def remove_ids(self, ids: Iterable[int]) -> int:
+        ids = [vid for vid in ids if vid in self.metadata]
+        if not ids or self.index is None:
+            return 0
+        self._ensure_writable()
+        id_array = np.asarray(ids, dtype='int64')
+        if index_kind(self.index) == "hnsw":
+            # HNSW graphs cannot drop nodes: rebuild from the surviving vectors
+            all_ids, vectors = reconstruct_all(self.index)
+            keep = ~np.isin(all_ids, id_array)
+            self.index = build_index("hnsw", vectors.shape[1], int(keep.sum()))
+            self.index.add_with_ids(vectors[keep], all_ids[keep])
+            removed = int((~keep).sum())
+        else:
+            removed = self.index.remove_ids(id_array)
+        for vid in ids:
+            self.metadata.pop(vid)
+            self.lexical.remove(vid)
+        self.version = _next_version()
+        print(f"[INFO] Removed {removed} vectors from Faiss index.")
+        return removed
+
+    def maybe_migrate_index(self):
+        """With index_type "auto", move to the index type the current vector count calls for."""
+        if self.index_type == "auto" and self.index is not None and index_kind(self.index) in ("flat", "ivf_flat", "ivf_pq"):
+            target = choose_index_type(self.index.ntotal)
+            if target != index_kind(self.index):
+                self.rebuild_index(target)
+
+    def rebuild_index(self, index_type: str = "auto"):
+        """Re-create the index with another type from the vectors it already holds."""
+        ids, vectors = reconstruct_all(self.index)
+        if index_type == "auto":
+            index_type = choose_index_type(len(ids))
+        index = build_index(index_type, vectors.shape[1], len(ids))
+        train_index(index, vectors)
+        index.add_with_ids(vectors, ids)
+        self.index = index
+        self.version = _next_version()
+        print(f"[INFO] Rebuilt Faiss index as {index_kind(index)} over {len(ids)} vectors")
+
+    @staticmethod
+    def store_exists(persist_dir: str) -> bool:
+        return current_snapshot_dir(persist_dir) is not None
+
+    def exists(self) -> bool:
+        return self.store_exists(self.persist_dir)
+
+    def is_current(self) -> bool:
+        """False once another save (from any process) has moved CURRENT past this store's snapshot."""
+        return self.snapshot_dir == current_snapshot_dir(self.persist_dir)
+
+    def index_bytes(self) -> int:
+        """Approximate memory held by the loaded index: the size of its serialized form."""
+        if self.index is None:
+            return 0
+        path = os.path.join(self.snapshot_dir or self.persist_dir, "faiss.index")
+        return os.path.getsize(path) if os.path.exists(path) else self.index.ntotal * self.index.d * 4
+
     def save(self):
-        faiss_path = os.path.join(self.persist_dir, "faiss.index")
-        meta_path = os.path.join(self.persist_dir, "metadata.pkl")
-        faiss.write_index(self.index, faiss_path)
-        with open(meta_path, "wb") as f:
-            pickle.dump(self.metadata, f)
-        print(f"[INFO] Saved Faiss index and metadata to {self.persist_dir}")
-
-    def load(self):
-        faiss_path = os.path.join(self.persist_dir, "faiss.index")
-        meta_path = os.path.join(self.persist_dir, "metadata.pkl")
-        self.index = faiss.read_index(faiss_path)
+        """
+        Write index and metadata to a new snapshot directory, then point CURRENT
+        at it with an atomic rename: readers see either the old or the new
+        snapshot, never a mix. Older snapshots beyond KEEP_SNAPSHOTS are removed.
+        """
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{_next_snapshot()}"
+        snapshot_dir = os.path.join(self.persist_dir, SNAPSHOTS_DIR, name)
+        os.makedirs(snapshot_dir)
+        faiss.write_index(self.index, os.path.join(snapshot_dir, "faiss.index"))
+        self.metadata.save(snapshot_dir)
+        self.lexical.save(snapshot_dir)
+        # readers must embed queries exactly like the chunks were embedded
+        with open(os.path.join(snapshot_dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+            json.dump({"embedding_model": self.embedding_model, "embedding_backend": self.embedding_backend}, f)
+
+        pointer = os.path.join(self.persist_dir, CURRENT_FILE)
+        tmp_pointer = f"{pointer}.{os.getpid()}.tmp"
+        with open(tmp_pointer, "w", encoding="utf-8") as f:
+            f.write(name)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_pointer, pointer)
+        self.snapshot_dir = snapshot_dir
+        self._prune_snapshots()
+        self.version = _next_version()
+        print(f"[INFO] Saved Faiss index and metadata to {snapshot_dir}")
+
+    def _prune_snapshots(self):
+        """
+        Keep the newest KEEP_SNAPSHOTS snapshots and drop the pre-snapshot flat
+        layout. Readers still mapping a removed snapshot keep working: unlinked
+        files live on until they are unmapped.
+        """
+        root = os.path.join(self.persist_dir, SNAPSHOTS_DIR)
+        snapshots = sorted((os.path.join(root, name) for name in os.listdir(root)), key=os.path.getmtime, reverse=True)
+        for old in snapshots[KEEP_SNAPSHOTS:]:
+            if old != self.snapshot_dir:
+                shutil.rmtree(old, ignore_errors=True)
+        for legacy in ["faiss.index", "metadata.pkl"] + list(METADATA_FILES.values()):
+            path = os.path.join(self.persist_dir, legacy)
+            if os.path.exists(path):
+                os.remove(path)
+
+    def load(self, mmap: bool = False):
+        """
+        Load the current snapshot.
+        mmap: map the index read-only (for readers); it is copied into memory on the first modification.
+        """
+        snapshot_dir = current_snapshot_dir(self.persist_dir)
+        if snapshot_dir is None:
+            raise FileNotFoundError(f"No saved vector store in {self.persist_dir}")
+        self.index, self._mapped = read_index(os.path.join(snapshot_dir, "faiss.index"), mmap)
+        self.snapshot_dir = snapshot_dir
+        manifest_path = os.path.join(snapshot_dir, MANIFEST_FILE)
+        if os.path.exists(manifest_path):
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            backend = manifest.get("embedding_backend", self.embedding_backend)
+            if backend != self.embedding_backend:
+                print(f"[INFO] Store was built with the '{backend}' embedding backend, querying with it")
+                self.embedding_backend = backend
+            if manifest.get("embedding_model") not in (None, self.embedding_model):
+                print(f"[WARN] Store was built with '{manifest['embedding_model']}', not '{self.embedding_model}'")
+        if ChunkMetadataStore.exists(snapshot_dir):
+            self.metadata = ChunkMetadataStore(snapshot_dir)
+        else:
+            self._migrate_pickled_metadata(os.path.join(snapshot_dir, "metadata.pkl"))
+        if BM25Index.exists(self.snapshot_dir):
+            self.lexical = BM25Index(self.snapshot_dir)
+        else:
+            # saved before the lexical index existed: built once here, persisted with the next save
+            self.lexical = BM25Index.from_metadata(self.metadata)
+            print(f"[INFO] Built BM25 index over {len(self.lexical)} chunks")
+        self.version = _next_version()
+        print(f"[INFO] Loaded Faiss index and metadata from {self.snapshot_dir}{' (mmap)' if self._mapped else ''}")
+
+    def _migrate_pickled_metadata(self, meta_path: str):
+        """Convert a metadata.pkl store to the columnar format, then drop the pickle."""
         with open(meta_path, "rb") as f:
-            self.metadata = pickle.load(f)
-        print(f"[INFO] Loaded Faiss index and metadata from {self.persist_dir}")
-
-    def search(self, query_embedding: np.ndarray, top_k: int = 10):
-        D, I = self.index.search(query_embedding, top_k)
-        results = []
-        for idx, dist in zip(I[0], D[0]):
-            meta = self.metadata[idx] if idx < len(self.metadata) else None
-            results.append({"index": idx, "distance": dist, "metadata": meta})
-        return results
-    
-    def query(self, query_text: str, top_k: int = 10):
-        print(f"[INFO] Querying vector store for: '{query_text}'")
-        query_emb = self.model.encode([query_text]).astype('float32')
-        return self.search(query_emb, top_k=top_k)
-    
+            legacy_meta = pickle.load(f)
+        self._ensure_writable()
+        if isinstance(legacy_meta, list):
+            self._migrate_positional_store(legacy_meta)
+        else:
+            self.metadata = ChunkMetadataStore.from_dict(legacy_meta)
+        self.lexical = BM25Index.from_metadata(self.metadata)
+        # written as the first snapshot, which also drops the pickle
+        self.save()
+        print(f"[INFO] Migrated metadata.pkl to columnar metadata in {self.persist_dir}")
+
+    def _migrate_positional_store(self, legacy_meta: List[dict]):
+        """Convert a store written before stable ids (list metadata, position = id)."""
+        vectors = self.index.reconstruct_n(0, self.index.ntotal)
+        self.index = None
+        self.metadata = ChunkMetadataStore()
+        metadatas = [{k: v for k, v in meta.items() if k != "chunk_id"} for meta in legacy_meta]
+        # key chunks by upload name like new uploads, so re-uploading or delete_sources finds them
+        renamed = {}
+        for meta in metadatas:
+            source = legacy_upload_name(meta.get("source"))
+            if source != meta.get("source"):
+                renamed[meta["source"]] = source
+                meta["source"] = source
+        if renamed:
+            print(f"[INFO] Renamed {len(renamed)} temp-file sources to their upload names: {sorted(set(renamed.values()))}. "
+                  f"The original loader lower-cased names, so a mixed-case re-upload still needs delete_sources() "
+                  f"on the old name, or a rebuild of the store.")
+        ids = [chunk_vector_id(m.get("source"), m.get("text", "")) for m in metadatas]
+        # identical chunks collapse onto one id
+        first = {}
+        for pos, vid in enumerate(ids):
+            first.setdefault(vid, pos)
+        keep = sorted(first.values())
+        self.add_embeddings(vectors[keep], [metadatas[p] for p in keep], ids=[ids[p] for p in keep])
+        print(f"[INFO] Migrated {len(legacy_meta)} positional vectors to stable ids.")
+
+    @staticmethod
+    def _chunk_metadata(chunk: Any, vid: int) -> dict:
+        return {
+            "text": chunk.page_content,
+            "source": chunk.metadata.get("source"),
+            "page": chunk.metadata.get("page", None),
+            "chunk_id": vid,
+            "content_hash": content_hash(chunk.page_content),
+            "file_type": chunk.metadata.get("file_type")
+        }
+
+    def search(self, query_embedding: np.ndarray, top_k: int = 10, nprobe: int = None, ef_search: int = None,
+               filters: dict = None):
+        return self.search_batch(query_embedding[:1], top_k=top_k, nprobe=nprobe, ef_search=ef_search, filters=filters)[0]
+
+    def _selector(self, spec: tuple):
+        """
+        (IDSelector, matching ids) for a filter_spec, built from the metadata
+        columns and reused while the store is unchanged.
+        """
+        key = (self.version, spec)
+        selector = self._selectors.get(key)
+        if selector is None:
+            sources, file_types, page_range = spec
+            ids = np.ascontiguousarray(self.metadata.ids_matching(sources, file_types, page_range), dtype='int64')
+            selector = (faiss.IDSelectorBatch(len(ids), faiss.swig_ptr(ids)), ids)
+            self._selectors[key] = selector
+            while len(self._selectors) > 32:
+                self._selectors.popitem(last=False)
+        return selector
+
+    def search_batch(self, query_embeddings: np.ndarray, top_k: int = 10, nprobe: int = None, ef_search: int = None,
+                     filters: dict = None):
+        """
+        Search every row of query_embeddings in one Faiss call; returns one result list per row.
+        filters: restrict hits by source / file_type / page_range (see filter_spec); applied inside
+                 Faiss through an IDSelector, so filtered-out vectors are skipped, not over-fetched.
+        """
+        selector = None
+        spec = filter_spec(filters)
+        if spec is not None:
+            selector, selected = self._selector(spec)
+            if len(selected) == 0:
+                return [[] for _ in range(len(query_embeddings))]
+        params = search_parameters(self.index, nprobe or self.nprobe, ef_search or self.ef_search, selector)
+        D, I = self.index.search(np.ascontiguousarray(query_embeddings, dtype='float32'), top_k, params=params)
+        batch_results = []
+        for row_ids, row_dists in zip(I, D):
+            results = []
+            for idx, dist in zip(row_ids, row_dists):
+                if idx == -1:
+                    continue
+                meta = self.metadata.get(int(idx))
+                results.append({"index": idx, "distance": dist, "metadata": meta})
+            batch_results.append(results)
+        return batch_results
+
+    def embed_queries(self, query_texts: List[str], batch_size: int = 64) -> np.ndarray:
+        """Query embeddings, served from the query cache where possible; misses are encoded in one batch."""
+        cache = get_query_cache()
+        key = model_key(self.embedding_model, self.embedding_backend)
+        embeddings = [cache.get_embedding(key, text) for text in query_texts]
+        missing = [i for i, emb in enumerate(embeddings) if emb is None]
+        if missing:
+            encoded = self.model.encode([query_texts[i] for i in missing], batch_size=batch_size).astype('float32')
+            for i, emb in zip(missing, encoded):
+                cache.put_embedding(key, query_texts[i], emb)
+                embeddings[i] = emb
+        return np.vstack(embeddings).astype('float32')
+
+    def lexical_search_batch(self, query_texts: List[str], top_k: int = 10, filters: dict = None):
+        """
+        BM25 search of every query text, without the embedding model. Hits are
+        shaped like search_batch with "distance" None and a "bm25" score.
+        """
+        spec = filter_spec(filters)
+        allowed = None if spec is None else self._selector(spec)[1]
+        batch_results = []
+        for text in query_texts:
+            results = []
+            for vid, score in self.lexical.search(text, top_k, allowed):
+                meta = self.metadata.get(vid)
+                if meta is not None:
+                    results.append({"index": vid, "distance": None, "bm25": score, "metadata": meta})
+            batch_results.append(results)
+        return batch_results
+
+    def hybrid_search_batch(self, query_texts: List[str], query_embeddings: np.ndarray, top_k: int = 10,
+                            nprobe: int = None, ef_search: int = None, filters: dict = None):
+        """
+        Dense and BM25 rankings of each query fused by reciprocal rank fusion,
+        so chunks naming an exact term (formula, section number, definition)
+        surface even when their embedding is not among the nearest. Hits carry
+        the "rrf" score, "bm25" when matched lexically and the L2 "distance" of
+        their vector, so distance-based consumers keep working.
+        """
+        candidates = top_k * HYBRID_CANDIDATES
+        dense = self.search_batch(query_embeddings, top_k=candidates, nprobe=nprobe, ef_search=ef_search, filters=filters)
+        lexical = self.lexical_search_batch(query_texts, top_k=candidates, filters=filters)
+        batch_results = []
+        for query_embedding, dense_hits, lexical_hits in zip(query_embeddings, dense, lexical):
+            results = fuse_hits(dense_hits, lexical_hits, top_k)
+            self.fill_distances(query_embedding, results, dense_hits)
+            batch_results.append(results)
+        return batch_results
+
+    def fill_distances(self, query_embedding: np.ndarray, results: List[dict], dense_hits: List[dict]):
+        """L2 distance for hits found only lexically, from their stored vector where the index can return it."""
+        missing = [hit for hit in results if hit["distance"] is None]
+        if not missing:
+            return
+        try:
+            vectors = np.vstack([self.index.reconstruct(int(hit["index"])) for hit in missing])
+            distances = ((vectors - query_embedding) ** 2).sum(axis=1)
+        except RuntimeError:
+            # IVF without a direct map: rank them no closer than the furthest dense candidate
+            worst = max((float(hit["distance"]) for hit in dense_hits), default=2.0)
+            distances = [worst] * len(missing)
+        for hit, distance in zip(missing, distances):
+            hit["distance"] = np.float32(distance)
+
+    def query(self, query_text: str, top_k: int = 10, nprobe: int = None, ef_search: int = None, filters: dict = None,
+              mode: str = "dense"):
+        """mode: one of SEARCH_MODES; "lexical" never loads or calls the embedding model."""
+        return self.query_batch([query_text], top_k=top_k, nprobe=nprobe, ef_search=ef_search, filters=filters, mode=mode)[0]
+
+    def query_batch(self, query_texts: List[str], top_k: int = 10, batch_size: int = 64, nprobe: int = None, ef_search: int = None,
+                    filters: dict = None, mode: str = "dense"):
+        """
+        Encode all queries in one batched model call and search them together.
+        Returns one result list per query, in input order, shaped like query().
+        mode: one of SEARCH_MODES
+        """
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode '{mode}', expected one of {SEARCH_MODES}")
+        if not query_texts:
+            return []
+        cache = get_query_cache()
+        version = self.version
+        params = (top_k, nprobe, ef_search, filter_spec(filters), mode)
+        batch_results = [cache.get_results(self.persist_dir, version, text, *params) for text in query_texts]
+        missing = [i for i, results in enumerate(batch_results) if results is None]
+        if missing:
+            print(f"[INFO] Querying vector store ({mode}) for {len(missing)} of {len(query_texts)} queries")
+            texts = [query_texts[i] for i in missing]
+            if mode == "lexical":
+                searched = self.lexical_search_batch(texts, top_k=top_k, filters=filters)
+            else:
+                query_embs = self.embed_queries(texts, batch_size=batch_size)
+                if mode == "hybrid":
+                    searched = self.hybrid_search_batch(texts, query_embs, top_k=top_k, nprobe=nprobe,
+                                                        ef_search=ef_search, filters=filters)
+                else:
+                    searched = self.search_batch(query_embs, top_k=top_k, nprobe=nprobe, ef_search=ef_search, filters=filters)
+            for i, results in zip(missing, searched):
+                cache.put_results(self.persist_dir, version, query_texts[i], results, *params)
+                batch_results[i] = results
+        return batch_results
+
 if __name__=="__main__":
     from src.retrival.dataLoader import load_documents
     import glob
@@ -83,4 +584,4 @@ if __name__=="__main__":
     store = FaissVectorStore("faiss_store")
     store.build_from_documents(docs)
     store.load()
-    print(store.query("What is overall accuracy achieved ?", top_k=10))
\ No newline at end of file
+    print(store.query("What is overall accuracy achieved ?", top_k=10))
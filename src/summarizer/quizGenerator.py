@@ -1,4 +1,4 @@
-import google.generativeai as genai
+from src.llm import ask_gemini, configure_gemini
 import json
 
 class quizGenerator:
@@ -9,9 +9,9 @@ class quizGenerator:
         :param api_key: Description
         :type api_key: str
         """
-        genai.configure(api_key=api_key)
+        configure_gemini(api_key)
         # Using Gemini 2.0 Flash (experimental) - fastest model for quiz generation
-        self.model = genai.GenerativeModel('gemini-2.0-flash-lite')
+        self.model_name = 'gemini-2.0-flash-lite'
 
     def generate_quiz(self,topic:str,topic_content:str)->json:
         
@@ -42,8 +42,7 @@ class quizGenerator:
         """
 
         try:
-                response = self.model.generate_content(prompt)
-                response_text = response.text.strip()
+                response_text = ask_gemini(prompt, model=self.model_name, cache=True)
 
                 # Remove markdown code blocks if present
                 if response_text.startswith("```json"):
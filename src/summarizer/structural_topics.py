@@ -0,0 +1,174 @@
+import re
+import json
+from collections import Counter
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+MARKER_WORDS = 40
+HEADING_SIZE_RATIO = 1.25   # a heading's font is at least this much larger than body text
+MAX_HEADING_WORDS = 12
+MIN_TOPICS = 2
+
+
+def _start_marker(text: str, words: int = MARKER_WORDS) -> str:
+    return " ".join(text.split()[:words])
+
+
+def _marker_at(page_text: str, heading: str) -> str:
+    """Marker starting at the heading's line on its page (or at the top of the page)."""
+    pattern = r"\s+".join(re.escape(w) for w in heading.split())
+    match = re.search(pattern, page_text, re.IGNORECASE) if pattern else None
+    return _start_marker(page_text[match.start():] if match else page_text)
+
+
+def _topic(title: str, description: str, start_marker: str) -> Dict[str, str]:
+    return {"title": title.strip(), "description": description, "start_marker": start_marker}
+
+
+def outline_topics(pdf) -> List[Dict[str, str]]:
+    """
+    Topics from the PDF's table of contents: the top outline level, or the
+    one below when the top level is a single book title entry.
+
+    Args:
+        pdf: an open pymupdf Document
+    """
+    toc = [(level, title, page) for level, title, page in pdf.get_toc(simple=True) if title.strip() and page >= 1]
+    if not toc:
+        return []
+    levels = sorted({level for level, _, _ in toc})
+    entries = [e for e in toc if e[0] == levels[0]]
+    if len(entries) < MIN_TOPICS and len(levels) > 1:
+        entries = [e for e in toc if e[0] == levels[1]]
+
+    topics = []
+    for _, title, page in entries:
+        page_text = pdf[page - 1].get_text()
+        marker = _marker_at(page_text, title)
+        if marker:
+            topics.append(_topic(title, f"Section starting on page {page}.", marker))
+    return topics
+
+
+def heading_topics(pdf, max_topics: int = 60) -> List[Dict[str, str]]:
+    """
+    Topics from typography: the most common font size is taken as body text
+    and the largest font size clearly above it that occurs on several short
+    lines is taken as the chapter heading level.
+
+    Args:
+        pdf: an open pymupdf Document
+        max_topics: heading levels with more lines than this are too fine-grained
+    """
+    body_sizes: Counter = Counter()
+    lines = []
+    for page in pdf:
+        for block in page.get_text("dict")["blocks"]:
+            for line in block.get("lines", []):
+                spans = [s for s in line["spans"] if s["text"].strip()]
+                if not spans:
+                    continue
+                text = " ".join(s["text"].strip() for s in spans)
+                size = round(max(s["size"] for s in spans), 1)
+                body_sizes[size] += len(text)
+                lines.append((page.number, size, text))
+    if not body_sizes:
+        return []
+    body = body_sizes.most_common(1)[0][0]
+
+    by_size: Dict[float, List[tuple]] = {}
+    for page_number, size, text in lines:
+        if size >= body * HEADING_SIZE_RATIO and len(text.split()) <= MAX_HEADING_WORDS and re.search(r"[A-Za-z]", text):
+            by_size.setdefault(size, []).append((page_number, text))
+    for size in sorted(by_size, reverse=True):
+        headings = by_size[size]
+        if MIN_TOPICS <= len(headings) <= max_topics:
+            page_texts = {}
+            topics = []
+            for page_number, text in headings:
+                if page_number not in page_texts:
+                    page_texts[page_number] = pdf[page_number].get_text()
+                topics.append(_topic(text, f"Section starting on page {page_number + 1}.",
+                                     _marker_at(page_texts[page_number], text)))
+            return topics
+    return []
+
+
+def segment_topics(blocks: List[str], embeddings: np.ndarray, window: int = 3, min_blocks: int = 6) -> List[Dict[str, str]]:
+    """
+    TextTiling over block embeddings: the cosine similarity of the `window`
+    blocks before and after each gap is computed, and gaps whose depth (how far
+    the similarity dips below the peaks on either side) exceeds mean - std/2
+    become topic boundaries, at least min_blocks apart.
+
+    Args:
+        blocks: consecutive text blocks of the document
+        embeddings: one embedding per block
+    """
+    if len(blocks) < 2 * min_blocks:
+        return [_topic(_title_guess(blocks[0]), "", _start_marker(blocks[0]))] if blocks else []
+    vectors = embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+    gaps = range(1, len(blocks))
+    similarity = np.array([
+        float(np.dot(vectors[max(0, g - window):g].mean(axis=0), vectors[g:g + window].mean(axis=0)))
+        for g in gaps])
+
+    depth = np.zeros_like(similarity)
+    for i, value in enumerate(similarity):
+        left = similarity[max(0, i - window):i + 1].max()
+        right = similarity[i:i + window + 1].max()
+        depth[i] = (left - value) + (right - value)
+    cutoff = depth.mean() - depth.std() / 2
+
+    boundaries = [0]
+    # deepest valleys first, keeping segments at least min_blocks long
+    for i in np.argsort(-depth):
+        gap = i + 1
+        if depth[i] <= cutoff or depth[i] <= 0:
+            break
+        if all(abs(gap - b) >= min_blocks for b in boundaries) and len(blocks) - gap >= min_blocks:
+            boundaries.append(gap)
+    boundaries.sort()
+    return [_topic(_title_guess(blocks[b]), "", _start_marker(blocks[b])) for b in boundaries]
+
+
+def _title_guess(text: str) -> str:
+    """First line of a block, when it reads like a heading; otherwise its first words."""
+    first_line = text.strip().split("\n", 1)[0].strip()
+    if 0 < len(first_line.split()) <= MAX_HEADING_WORDS:
+        return first_line
+    return " ".join(text.split()[:8]) + "..."
+
+
+def title_segments(topics: List[Dict[str, str]], document_text: str, ask: Callable[[str], str],
+                   spans: List[Optional[tuple]]) -> List[Dict[str, str]]:
+    """
+    Title and describe every segment with a single LLM call that sees only
+    the opening of each segment.
+
+    Args:
+        ask: prompt -> response text
+        spans: (start, end) offsets of the topics in document_text
+    """
+    openings = []
+    for i, (topic, span) in enumerate(zip(topics, spans)):
+        opening = document_text[span[0]:span[0] + 800] if span else topic["start_marker"]
+        openings.append(f"Segment {i + 1}:\n{opening}")
+    prompt = ("Below are the openings of consecutive sections of one document. For each section give a short "
+              "chapter-style title and a one sentence description.\n"
+              "Return ONLY a JSON array with one object per section, in order: "
+              '[{"title": "...", "description": "..."}]\n\n' + "\n\n".join(openings))
+    response = ask(prompt).strip()
+    response = re.sub(r"^```(json)?|```$", "", response).strip()
+    try:
+        labels = json.loads(response)
+    except json.JSONDecodeError as e:
+        print(f"JSON parsing error while titling segments: {e}")
+        return topics
+    if not isinstance(labels, list) or len(labels) != len(topics):
+        print(f"Expected {len(topics)} segment titles, got {len(labels) if isinstance(labels, list) else labels!r}")
+        return topics
+    return [_topic(str(label.get("title") or topic["title"]), str(label.get("description") or topic["description"]),
+                   topic["start_marker"]) if isinstance(label, dict) else topic
+            for topic, label in zip(topics, labels)]
@@ -1,33 +1,62 @@
-import google.generativeai as genai
-from typing import Generator
+from src.llm import ask_gemini, stream_gemini, configure_gemini
+from typing import Generator, List, Optional, Union
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import threading
+import re
+
+MAX_MAP_LEVELS = 3
+MIN_LEVEL_SHRINK = 0.8  # a map level must cut the text to at most this fraction of its input
 
 
 class Summarizer:
     """Generate summaries using Gemini 2.0 Flash-Lite."""
 
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, single_pass_chars: int = 40000, piece_chars: int = 12000,
+                 max_workers: int = 4, max_cached_partials: int = 2048):
         """
         Initialize Summarizer with Gemini API key.
 
         Args:
             api_key: Google Gemini API key
+            single_pass_chars: Longer content is summarized with map-reduce instead of one prompt
+            piece_chars: Target size of each map-reduce piece
+            max_workers: Pieces summarized concurrently
+            max_cached_partials: Partial summaries kept in memory, keyed by piece content hash
         """
-        genai.configure(api_key=api_key)
+        configure_gemini(api_key)
         # Using Gemini 2.0 Flash (experimental) - fastest model for summarization
-        self.model = genai.GenerativeModel('gemini-2.0-flash-lite')
-
-    def summarize(self, topic_title: str, content: str, stream: bool = False) -> str:
+        self.model_name = 'gemini-2.0-flash-lite'
+        self.single_pass_chars = single_pass_chars
+        self.piece_chars = piece_chars
+        self.max_workers = max_workers
+        self.max_cached_partials = max_cached_partials
+        self._partials: "OrderedDict[str, str]" = OrderedDict()
+        self._partials_lock = threading.Lock()
+
+    def summarize(self, topic_title: str, content: str, stream: bool = False,
+                  map_reduce: Optional[bool] = None) -> Union[str, Generator[str, None, None]]:
         """
         Generate detailed summary for an entire chapter/topic.
 
         Args:
             topic_title: Title of the topic/chapter
             content: Full text content of the chapter to summarize
-            stream: Whether to stream the response
+            stream: Whether to stream the response (for map-reduce, the final reduce is streamed)
+            map_reduce: Force (True) or disable (False) map-reduce; by default it is used
+                        when content is longer than single_pass_chars
 
         Returns:
             Detailed summary text
         """
+        if map_reduce is None:
+            map_reduce = len(content) > self.single_pass_chars
+        if map_reduce:
+            return self._summarize_map_reduce(topic_title, content, stream)
+        if len(content) > self.single_pass_chars:
+            print(f"Warning: summarizing only the first {self.single_pass_chars} of {len(content)} chars")
+
         prompt = f"""Provide a DETAILED and COMPREHENSIVE summary of the entire chapter below.
 
 Chapter/Topic: {topic_title}
@@ -42,7 +71,7 @@ Instructions:
 - Make sure the summary is self-contained and complete
 
 Full Chapter Content:
-{content[:40000]}
+{content[:self.single_pass_chars]}
 
 DETAILED SUMMARY:"""
 
@@ -50,8 +79,7 @@ DETAILED SUMMARY:"""
             if stream:
                 return self._summarize_stream(prompt)
             else:
-                response = self.model.generate_content(prompt)
-                return response.text.strip()
+                return ask_gemini(prompt, model=self.model_name)
 
         except Exception as e:
             print(f"Error generating summary: {e}")
@@ -68,10 +96,140 @@ DETAILED SUMMARY:"""
             Chunks of summary text
         """
         try:
-            response = self.model.generate_content(prompt, stream=True)
-            for chunk in response:
-                if chunk.text:
-                    yield chunk.text
+            yield from stream_gemini(prompt, model=self.model_name)
         except Exception as e:
             print(f"Error in streaming summary: {e}")
             yield f"Error: {str(e)}"
+
+    def split_pieces(self, content: str, piece_chars: int = None) -> List[str]:
+        """
+        Split content into pieces of about piece_chars on paragraph boundaries;
+        a single paragraph longer than that is cut at sentence ends.
+
+        Args:
+            content: Text to split
+            piece_chars: Target piece size in characters
+
+        Returns:
+            List of text pieces, in order
+        """
+        piece_chars = piece_chars or self.piece_chars
+        paragraphs = []
+        for para in re.split(r'\n\s*\n', content):
+            while len(para) > piece_chars:
+                cut = para.rfind('. ', 0, piece_chars)
+                cut = cut + 1 if cut > piece_chars // 2 else piece_chars
+                paragraphs.append(para[:cut])
+                para = para[cut:]
+            paragraphs.append(para)
+
+        pieces = []
+        current = ""
+        for para in paragraphs:
+            if len(current) + len(para) > piece_chars and current.strip():
+                pieces.append(current.strip())
+                current = ""
+            current += para + "\n\n"
+        if current.strip():
+            pieces.append(current.strip())
+        return pieces
+
+    def _summarize_piece(self, piece: str) -> str:
+        """Partial summary of one piece, cached by the piece's content hash."""
+        key = hashlib.sha1(piece.encode("utf-8")).hexdigest()
+        with self._partials_lock:
+            if key in self._partials:
+                self._partials.move_to_end(key)
+                return self._partials[key]
+
+        prompt = f"""Summarize the following part of a longer chapter.
+
+Instructions:
+- Keep every key concept, definition, argument, example and conclusion in this part
+- Keep names, numbers and formulas exactly as written
+- Use concise bullet points
+- Do not add an introduction or a conclusion; other parts are summarized separately
+
+Text:
+{piece}
+
+SUMMARY OF THIS PART:"""
+        summary = ask_gemini(prompt, model=self.model_name, cache=True)
+
+        with self._partials_lock:
+            self._partials[key] = summary
+            while len(self._partials) > self.max_cached_partials:
+                self._partials.popitem(last=False)
+        return summary
+
+    def _map(self, content: str) -> str:
+        """
+        Summarize the pieces of content concurrently and join the partial
+        summaries in order; repeated while the joined summaries are still too
+        long for one reduce prompt, for at most MAX_MAP_LEVELS levels. A level
+        that does not shrink the text by a real fraction ends the loop too.
+        The result never exceeds single_pass_chars: what still does not fit
+        is cut, like the single-pass prompt.
+        """
+        for level in range(1, MAX_MAP_LEVELS + 1):
+            pieces = self.split_pieces(content)
+            print(f"Map-reduce level {level}: summarizing {len(pieces)} pieces ({len(content)} chars)")
+            with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(pieces)))) as pool:
+                partials = list(pool.map(self._summarize_piece, pieces))
+            joined = "\n\n".join(f"Part {i + 1}:\n{partial}" for i, partial in enumerate(partials))
+            if len(joined) <= self.single_pass_chars:
+                return joined
+            shrank = len(joined) <= len(content) * MIN_LEVEL_SHRINK
+            content = joined
+            if len(pieces) == 1 or not shrank:
+                print(f"Map-reduce level {level} did not shrink the text enough ({len(content)} chars)")
+                break
+        print(f"Warning: reducing only the first {self.single_pass_chars} of {len(content)} chars of partial summaries")
+        return content[:self.single_pass_chars]
+
+    def _summarize_map_reduce(self, topic_title: str, content: str, stream: bool = False) -> Union[str, Generator[str, None, None]]:
+        """
+        Map-reduce summary: partial summaries of paragraph-aligned pieces
+        (in parallel), then one reduce prompt over all of them.
+
+        Args:
+            topic_title: Title of the topic/chapter
+            content: Full text content of the chapter to summarize
+            stream: Whether to stream the reduce step
+
+        Returns:
+            Detailed summary text, or a generator of its chunks when streaming
+        """
+        try:
+            partials = self._map(content)
+        except Exception as e:
+            print(f"Error generating partial summaries: {e}")
+            raise
+
+        prompt = f"""Below are summaries of consecutive parts of one chapter, in order.
+Combine them into a DETAILED and COMPREHENSIVE summary of the entire chapter.
+
+Chapter/Topic: {topic_title}
+
+Instructions:
+- This is a FULL CHAPTER summary - be thorough and detailed
+- Capture ALL major points, key concepts, and important details from every part
+- Merge points that repeat across parts; keep the chapter's order of ideas
+- Use clear, professional language
+- Structure with bullet points and paragraphs for readability
+- Make sure the summary is self-contained and complete
+
+Part Summaries:
+{partials}
+
+DETAILED SUMMARY:"""
+
+        try:
+            if stream:
+                return self._summarize_stream(prompt)
+            else:
+                return ask_gemini(prompt, model=self.model_name)
+
+        except Exception as e:
+            print(f"Error generating summary: {e}")
+            raise
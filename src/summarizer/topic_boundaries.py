@@ -0,0 +1,167 @@
+import re
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+WORD = re.compile(r"\w+")
+KEY_WORDS = 3          # marker words hashed for the multi-pattern scan
+MARKER_WORDS = 12      # marker words compared after a key hit
+FUZZY_MIN_SHARE = 0.4  # share of a marker's word pairs that must line up for a fuzzy match
+MAX_TOPIC_CHARS = 50000
+FALLBACK_CHARS = 10000
+
+# match quality, best first: whole marker, first 10 words, first 5 words, fuzzy
+EXACT, PREFIX10, PREFIX5, FUZZY = range(4)
+
+
+def _tokens(text: str) -> List[str]:
+    return [w.lower() for w in WORD.findall(text)]
+
+
+class TopicBoundaryResolver:
+    """
+    Locates topic start markers in one document.
+
+    The text is tokenised once into lower-cased words with their character
+    offsets, so whitespace, case and punctuation differences (PDF line breaks,
+    OCR) do not break matches. All pending markers are then found in a single
+    pass over the words: every marker is keyed by its first words and each text
+    position is one hash lookup (Rabin-Karp style multi-pattern search).
+    Markers with no usable hit get one more shared pass that votes on aligned
+    word pairs (fuzzy fallback). Hits are cached per marker, so later lookups
+    never rescan the document.
+    """
+
+    def __init__(self, full_text: str):
+        self.full_text = full_text
+        self._words: List[str] = []
+        self._starts: List[int] = []
+        for match in WORD.finditer(full_text):
+            self._words.append(match.group().lower())
+            self._starts.append(match.start())
+        # marker -> {quality: sorted word positions}
+        self._hits: Dict[str, Dict[int, List[int]]] = {}
+
+    def prepare(self, markers: List[Optional[str]]):
+        """Resolve every not yet seen marker with one scan of the document."""
+        pending: Dict[str, List[str]] = {}
+        for marker in markers:
+            if marker and marker not in self._hits and marker not in pending:
+                pending[marker] = _tokens(marker)[:MARKER_WORDS]
+        if not pending:
+            return
+        by_key: Dict[tuple, List[str]] = defaultdict(list)
+        for marker, tokens in pending.items():
+            self._hits[marker] = {}
+            if tokens:
+                by_key[tuple(tokens[:KEY_WORDS])].append(marker)
+
+        words = self._words
+        key_lengths = {len(key) for key in by_key}
+        first_words = {key[0] for key in by_key}
+        for pos, word in enumerate(words):
+            if word not in first_words:
+                continue
+            for n in key_lengths:
+                candidates = by_key.get(tuple(words[pos:pos + n]))
+                if not candidates:
+                    continue
+                for marker in candidates:
+                    tokens = pending[marker]
+                    matched = n
+                    while matched < len(tokens) and pos + matched < len(words) and words[pos + matched] == tokens[matched]:
+                        matched += 1
+                    quality = self._quality(matched, len(tokens))
+                    if quality is not None:
+                        self._hits[marker].setdefault(quality, []).append(pos)
+
+        unresolved = {m: t for m, t in pending.items() if not self._hits[m] and len(t) >= 2}
+        if unresolved:
+            self._fuzzy(unresolved)
+
+    @staticmethod
+    def _quality(matched: int, n_tokens: int) -> Optional[int]:
+        if matched == n_tokens:
+            return EXACT
+        if matched >= 10:
+            return PREFIX10
+        if matched >= 5:
+            return PREFIX5
+        return None
+
+    def _fuzzy(self, markers: Dict[str, List[str]]):
+        """
+        One pass for all still-unmatched markers: the anchor most of their word
+        pairs agree on wins. A word split or merged in the text ("Ohm's" vs
+        "Ohms") shifts the anchor of every later pair by one, so anchors are
+        scored together with their neighbours, and the start is taken from the
+        pair nearest the beginning of the marker.
+        """
+        pairs: Dict[tuple, List[Tuple[str, int]]] = defaultdict(list)
+        for marker, tokens in markers.items():
+            for offset in range(len(tokens) - 1):
+                pairs[(tokens[offset], tokens[offset + 1])].append((marker, offset))
+        votes: Dict[str, Dict[int, int]] = {marker: defaultdict(int) for marker in markers}
+        first_offset: Dict[str, Dict[int, int]] = {marker: {} for marker in markers}
+        words = self._words
+        for pos in range(len(words) - 1):
+            for marker, offset in pairs.get((words[pos], words[pos + 1]), ()):
+                if pos >= offset:
+                    anchor = pos - offset
+                    votes[marker][anchor] += 1
+                    first_offset[marker][anchor] = min(offset, first_offset[marker].get(anchor, offset))
+        for marker, anchors in votes.items():
+            if not anchors:
+                continue
+            needed = max(2, FUZZY_MIN_SHARE * (len(markers[marker]) - 1))
+            smoothed = {a: sum(anchors.get(a + d, 0) for d in (-1, 0, 1)) for a in anchors}
+            best = max(smoothed.values())
+            if best < needed:
+                continue
+            starts = set()
+            for anchor, score in smoothed.items():
+                if score == best:
+                    run = [a for a in (anchor - 1, anchor, anchor + 1) if a in anchors]
+                    starts.add(min(run, key=lambda a: (first_offset[marker][a], a)))
+            self._hits[marker][FUZZY] = sorted(starts)
+
+    def locate(self, marker: Optional[str], after: int = 0) -> Optional[int]:
+        """
+        Character offset of the marker's first occurrence at or after `after`,
+        taking the best match quality available; None when not found.
+        """
+        if not marker:
+            return None
+        self.prepare([marker])
+        hits = self._hits[marker]
+        for quality in (EXACT, PREFIX10, PREFIX5, FUZZY):
+            positions = hits.get(quality)
+            if not positions:
+                continue
+            i = bisect_left(positions, bisect_left(self._starts, after))
+            if i < len(positions):
+                return self._starts[positions[i]]
+        return None
+
+    def span(self, current_marker: str, next_marker: Optional[str] = None) -> Optional[Tuple[int, int]]:
+        """(start, end) of the text from current_marker up to next_marker; None when the start is not found."""
+        self.prepare([current_marker, next_marker])
+        start = self.locate(current_marker)
+        if start is None:
+            return None
+        end = self.locate(next_marker, start + 1)
+        if end is None:
+            end = min(len(self.full_text), start + MAX_TOPIC_CHARS)
+        return start, end
+
+    def spans(self, markers: List[str]) -> List[Optional[Tuple[int, int]]]:
+        """Spans of consecutive topics, each ending where the next one starts."""
+        self.prepare(markers)
+        return [self.span(marker, markers[i + 1] if i + 1 < len(markers) else None)
+                for i, marker in enumerate(markers)]
+
+    def content(self, current_marker: str, next_marker: Optional[str] = None) -> str:
+        span = self.span(current_marker, next_marker)
+        if span is None:
+            return self.full_text[:FALLBACK_CHARS]  # Return first part as fallback
+        return self.full_text[span[0]:span[1]].strip()
@@ -1,6 +1,11 @@
-import google.generativeai as genai
+from src.llm import ask_gemini, configure_gemini
+from src.summarizer.topic_boundaries import TopicBoundaryResolver
+from src.summarizer.structural_topics import (MIN_TOPICS, outline_topics, heading_topics, segment_topics,
+                                              title_segments)
 import json
-from typing import List, Dict
+from typing import List, Dict, Iterator, Optional, Tuple
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import os
 import re
 
@@ -8,17 +13,26 @@ import re
 class TopicDetector:
     """Detect topics and chapters in documents using Gemini 2.0 Flash-Lite."""
 
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, max_workers: int = 4, chunk_retries: int = 2,
+                 embedding_model: str = "all-MiniLM-L6-v2"):
         """
         Initialize TopicDetector with Gemini API key.
 
         Args:
             api_key: Google Gemini API key
+            max_workers: Chunks analysed concurrently
+            chunk_retries: Extra attempts for a chunk whose call fails or returns invalid JSON
+            embedding_model: Model for embedding-based segmentation in structural mode
         """
-        genai.configure(api_key=api_key)
+        configure_gemini(api_key)
         # Using Gemini 2.0 Flash (experimental) - fastest model for topic detection
-        self.model = genai.GenerativeModel('gemini-2.0-flash-lite')
+        self.model_name = 'gemini-2.0-flash-lite'
         self.chunk_size = 40000  # ~10000 tokens (10000 * 4 chars per token)
+        self.max_workers = max_workers
+        self.chunk_retries = chunk_retries
+        self.embedding_model = embedding_model
+        self.failed_chunks: List[int] = []
+        self._resolvers: "OrderedDict[str, TopicBoundaryResolver]" = OrderedDict()
 
     def chunk_text(self, text: str, chunk_size: int = None) -> List[str]:
         """
@@ -55,28 +69,8 @@ class TopicDetector:
 
         return chunks
 
-    def detect_topics(self, document_text: str) -> List[Dict[str, str]]:
-        """
-        Analyze document and detect major topics/chapters using chunked processing.
-
-        Args:
-            document_text: Full text of the document
-
-        Returns:
-            List of dictionaries containing topic information
-        """
-        # Split document into chunks
-        chunks = self.chunk_text(document_text)
-        print(f"Split document into {len(chunks)} chunks for processing")
-
-        all_topics = []
-
-        # Process each chunk
-        for i, chunk in enumerate(chunks):
-            chunk_num = i + 1
-            print(f"Processing chunk {chunk_num}/{len(chunks)}...")
-
-            prompt = f"""Analyze the following text segment (Part {chunk_num} of {len(chunks)}) and identify ONLY the MAJOR topics or chapters.
+    def _chunk_prompt(self, chunk: str, chunk_num: int, total: int) -> str:
+        return f"""Analyze the following text segment (Part {chunk_num} of {total}) and identify ONLY the MAJOR topics or chapters.
 
 IMPORTANT: Focus on MAJOR topics only (like chapters, main sections, key concepts). Ignore minor subsections or small details.
 
@@ -104,31 +98,90 @@ CRITICAL RULES:
 - Aim for 2-5 major topics per chunk maximum
 """
 
+    @staticmethod
+    def _parse_topics(response_text: str) -> List[Dict[str, str]]:
+        # Remove markdown code blocks if present
+        if response_text.startswith("```json"):
+            response_text = response_text[7:]
+        if response_text.startswith("```"):
+            response_text = response_text[3:]
+        if response_text.endswith("```"):
+            response_text = response_text[:-3]
+
+        topics = json.loads(response_text.strip())
+        if not isinstance(topics, list):
+            raise ValueError(f"expected a JSON array, got {type(topics).__name__}")
+        return [t for t in topics if isinstance(t, dict) and t.get("title") and t.get("start_marker")]
+
+    def _detect_chunk_topics(self, chunk: str, chunk_num: int, total: int) -> List[Dict[str, str]]:
+        """
+        Topics of one chunk. A malformed response or failed call is retried
+        (transport errors are already retried inside the client); retries bypass
+        the cached response and overwrite it, so a malformed answer that was
+        cached is replaced by the retry's instead of being served on every run.
+        """
+        prompt = self._chunk_prompt(chunk, chunk_num, total)
+        for attempt in range(self.chunk_retries + 1):
             try:
-                response = self.model.generate_content(prompt)
-                response_text = response.text.strip()
-
-                # Remove markdown code blocks if present
-                if response_text.startswith("```json"):
-                    response_text = response_text[7:]
-                if response_text.startswith("```"):
-                    response_text = response_text[3:]
-                if response_text.endswith("```"):
-                    response_text = response_text[:-3]
-
-                response_text = response_text.strip()
-
-                chunk_topics = json.loads(response_text)
-                all_topics.extend(chunk_topics)
-                print(f"Found {len(chunk_topics)} topics in chunk {chunk_num}")
-
-            except json.JSONDecodeError as e:
-                print(f"JSON parsing error in chunk {chunk_num}: {e}")
-                print(f"Response: {response_text[:200]}")
-                continue
+                response_text = ask_gemini(prompt, model=self.model_name, cache=True, refresh=attempt > 0)
+                return self._parse_topics(response_text)
             except Exception as e:
-                print(f"Error processing chunk {chunk_num}: {e}")
-                continue
+                if attempt == self.chunk_retries:
+                    raise
+                print(f"Chunk {chunk_num} attempt {attempt + 1} failed ({e}), retrying...")
+
+    def iter_topics(self, document_text: str) -> Iterator[Tuple[int, List[Dict[str, str]]]]:
+        """
+        Detect topics chunk by chunk with up to max_workers concurrent Gemini
+        calls, yielding (chunk index, topics) as each chunk completes, i.e. not
+        necessarily in document order. Chunks that still fail after retries
+        yield an empty list and are recorded in self.failed_chunks.
+
+        Args:
+            document_text: Full text of the document
+        """
+        # Split document into chunks
+        chunks = self.chunk_text(document_text)
+        print(f"Split document into {len(chunks)} chunks for processing")
+        self.failed_chunks = []
+
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(chunks)))) as pool:
+            futures = {pool.submit(self._detect_chunk_topics, chunk, i + 1, len(chunks)): i
+                       for i, chunk in enumerate(chunks)}
+            for future in as_completed(futures):
+                i = futures[future]
+                try:
+                    chunk_topics = future.result()
+                except Exception as e:
+                    print(f"[ERROR] Chunk {i + 1}/{len(chunks)} failed after {self.chunk_retries + 1} attempts: {e}")
+                    self.failed_chunks.append(i)
+                    chunk_topics = []
+                else:
+                    print(f"Found {len(chunk_topics)} topics in chunk {i + 1}/{len(chunks)}")
+                yield i, chunk_topics
+
+    def detect_topics(self, document_text: str, mode: str = "llm", pdf_data: bytes = None,
+                      title_with_llm: bool = False) -> List[Dict[str, str]]:
+        """
+        Analyze document and detect major topics/chapters using chunked processing.
+
+        Args:
+            document_text: Full text of the document
+            mode: "llm" to ask Gemini chunk by chunk, "structural" for detect_topics_structural
+            pdf_data: Raw PDF bytes, used by structural mode for the outline and fonts
+            title_with_llm: Structural mode only, see detect_topics_structural
+
+        Returns:
+            List of dictionaries containing topic information
+        """
+        if mode == "structural":
+            return self.detect_topics_structural(document_text, pdf_data, title_with_llm)
+        if mode != "llm":
+            raise ValueError(f"Unknown topic detection mode '{mode}', expected 'llm' or 'structural'")
+
+        topics_by_chunk = dict(self.iter_topics(document_text))
+        # merge in document order, whatever order the chunks finished in
+        all_topics = [topic for i in sorted(topics_by_chunk) for topic in topics_by_chunk[i]]
 
         # Deduplicate similar topics
         deduplicated_topics = self._deduplicate_topics(all_topics)
@@ -148,6 +201,65 @@ CRITICAL RULES:
 
         return filtered_topics
 
+    def detect_topics_structural(self, document_text: str, pdf_data: bytes = None,
+                                 title_with_llm: bool = False) -> List[Dict[str, str]]:
+        """
+        Detect topics locally from the document's structure, in order of preference:
+        the PDF outline, then heading font sizes, then embedding-similarity
+        segmentation (TextTiling) over chunk embeddings. PDFs are chunked page
+        by page like ingestion does, so their chunks are served from the
+        embedding cache filled at ingestion.
+
+        Args:
+            document_text: Full text of the document
+            pdf_data: Raw PDF bytes (None for other formats: segmentation only)
+            title_with_llm: Title and describe embedding segments with one Gemini call;
+                            otherwise they are titled from their first line
+
+        Returns:
+            List of dictionaries containing topic information, as detect_topics
+        """
+        topics, method = [], None
+        if pdf_data is not None:
+            import pymupdf
+            with pymupdf.open(stream=pdf_data, filetype="pdf") as pdf:
+                topics, method = outline_topics(pdf), "outline"
+                if len(topics) < MIN_TOPICS:
+                    topics, method = heading_topics(pdf), "headings"
+        if len(topics) < MIN_TOPICS:
+            topics, method = self._embedding_segments(document_text, pdf_data), "embeddings"
+        print(f"Found {len(topics)} topics from {method}")
+
+        filtered_topics = self._filter_small_topics(topics, document_text)
+        print(f"Total topics after filtering small topics: {len(filtered_topics)}")
+
+        if not filtered_topics:
+            return [{
+                "title": "Full Document",
+                "description": "Unable to detect specific topics. Showing full document.",
+                "start_marker": document_text[:50]
+            }]
+        if title_with_llm and method == "embeddings":
+            filtered_topics = title_segments(filtered_topics, document_text,
+                                             lambda prompt: ask_gemini(prompt, model=self.model_name, cache=True),
+                                             self.topic_spans(document_text, filtered_topics))
+        return filtered_topics
+
+    def _embedding_segments(self, document_text: str, pdf_data: bytes = None) -> List[Dict[str, str]]:
+        from src.retrival.embedding import EmbeddingPipeLine
+        from src.retrival.dataLoader import PARSERS
+        pipeline = EmbeddingPipeLine(model_name=self.embedding_model)
+        splitter = pipeline.text_splitter()
+        if pdf_data is not None:
+            # per page, with ingestion's parser and splitter settings: identical chunks, cached embeddings
+            blocks = splitter.split_documents(list(PARSERS["pdf"](pdf_data, "")))
+        else:
+            blocks = splitter.create_documents([document_text])
+        if not blocks:
+            return []
+        embeddings = pipeline.embed_chunks(blocks)
+        return segment_topics([block.page_content for block in blocks], embeddings)
+
     def _deduplicate_topics(self, topics: List[Dict[str, str]]) -> List[Dict[str, str]]:
         """
         Remove duplicate topics based on title similarity.
@@ -219,6 +331,9 @@ CRITICAL RULES:
         if len(topics) <= 1:
             return topics
 
+        # resolve every marker in one scan; the per-topic lookups below then hit the cache
+        self.boundary_resolver(full_text).prepare([topic['start_marker'] for topic in topics])
+
         filtered_topics = []
         i = 0
 
@@ -258,6 +373,21 @@ CRITICAL RULES:
 
         return filtered_topics
 
+    def boundary_resolver(self, full_text: str) -> TopicBoundaryResolver:
+        """Marker resolver for this document, built once and reused by every later call on the same text."""
+        resolver = self._resolvers.pop(full_text, None) or TopicBoundaryResolver(full_text)
+        self._resolvers[full_text] = resolver
+        while len(self._resolvers) > 4:
+            self._resolvers.popitem(last=False)
+        return resolver
+
+    def topic_spans(self, full_text: str, topics: List[Dict[str, str]]) -> List[Optional[Tuple[int, int]]]:
+        """
+        (start, end) character offsets of every topic, found in one pass over
+        the document; None for a topic whose start marker could not be located.
+        """
+        return self.boundary_resolver(full_text).spans([topic['start_marker'] for topic in topics])
+
     def extract_topic_content(self, full_text: str, current_marker: str, next_marker: str = None) -> str:
         """
         Extract FULL content for a specific topic/chapter.
@@ -270,39 +400,4 @@ CRITICAL RULES:
         Returns:
             Complete text content for the entire chapter/topic
         """
-        # Try to find the exact marker
-        start_idx = full_text.find(current_marker)
-
-        if start_idx == -1:
-            # Try partial match with first 10 words
-            words = current_marker.split()[:10]
-            search_term = " ".join(words)
-            start_idx = full_text.find(search_term)
-
-        if start_idx == -1:
-            # Try even shorter match
-            words = current_marker.split()[:5]
-            search_term = " ".join(words)
-            start_idx = full_text.find(search_term)
-
-        if start_idx == -1:
-            return full_text[:10000]  # Return first part as fallback
-
-        # Extract content up to next marker or end of document
-        if next_marker:
-            # Try to find next marker
-            end_idx = full_text.find(next_marker, start_idx + len(current_marker))
-
-            if end_idx == -1:
-                # Try partial match for next marker
-                next_words = next_marker.split()[:10]
-                next_search = " ".join(next_words)
-                end_idx = full_text.find(next_search, start_idx + len(current_marker))
-
-            if end_idx != -1:
-                # Return FULL chapter content between current and next marker
-                return full_text[start_idx:end_idx].strip()
-
-        # If no next marker, return from start to end (or large chunk)
-        # Extract up to 50,000 chars to capture full chapter
-        return full_text[start_idx:start_idx + 50000].strip()
+        return self.boundary_resolver(full_text).content(current_marker, next_marker)
@@ -0,0 +1,173 @@
+import io
+import os
+import time
+import asyncio
+import hashlib
+
+import numpy as np
+import pytest
+
+from src.llm import client
+from src.llm import FakeLLM, ask_gemini, aask_gemini, configure_cache, disable_cache, use_fake_provider
+from src.summarizer.topic_boundaries import TopicBoundaryResolver
+
+MODEL = "all-MiniLM-L6-v2"
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    monkeypatch.setattr(client, "backoff_delay", lambda attempt, exc: 0.0)
+    yield lambda **kwargs: use_fake_provider(FakeLLM(**kwargs))
+    use_fake_provider(None)
+    disable_cache()
+
+
+def test_retries_rate_limited_calls(fake_llm):
+    fake = fake_llm(default="ok", rate_limit_first=2)
+    assert ask_gemini("hello") == "ok"
+    assert len(fake.calls) == 3
+
+
+def test_does_not_retry_other_errors(fake_llm):
+    def fail(provider, model, prompt):
+        raise ValueError("bad request")
+    fake = fake_llm(responses=fail)
+    with pytest.raises(ValueError):
+        ask_gemini("hello")
+    assert len(fake.calls) == 1
+
+
+def test_async_semaphores_are_per_loop(fake_llm, monkeypatch):
+    monkeypatch.setitem(client.MAX_CONCURRENCY, "fake", 2)
+    fake_llm(default="ok", latency=0.02)
+
+    async def run():
+        active = peak = 0
+        original = client._fake.acomplete
+
+        async def tracked(*args):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            try:
+                return await original(*args)
+            finally:
+                active -= 1
+        client._fake.acomplete = tracked
+        try:
+            replies = await asyncio.gather(*(aask_gemini(f"q{i}") for i in range(6)))
+        finally:
+            client._fake.acomplete = original
+        return replies, peak, client._async_limit("fake")
+
+    first_replies, first_peak, first_limit = asyncio.run(run())
+    second_replies, second_peak, second_limit = asyncio.run(run())
+    assert first_replies == second_replies == ["ok"] * 6
+    assert first_peak == second_peak == 2
+    assert first_limit is not second_limit
+
+
+def test_response_cache_hit_and_ttl(fake_llm, tmp_path):
+    fake = fake_llm(default="answer")
+    cache = configure_cache(str(tmp_path / "llm_cache.sqlite"), ttl=0.2)
+    assert ask_gemini("what is ohm's law", cache=True) == "answer"
+    assert ask_gemini("what is ohm's law", cache=True) == "answer"
+    assert len(fake.calls) == 1
+    assert cache.stats()["hits"] == 1
+    time.sleep(0.3)
+    ask_gemini("what is ohm's law", cache=True)
+    assert len(fake.calls) == 2
+
+
+def test_resolver_exact_marker():
+    text = "Preface text.\n\nChapter 2 Kirchhoff's laws describe current and voltage in circuits. More text."
+    resolver = TopicBoundaryResolver(text)
+    assert resolver.locate("CHAPTER 2 kirchhoff's LAWS describe current") == text.index("Chapter 2")
+
+
+@pytest.mark.parametrize("text_heading, marker", [
+    ("Chapter 3 Ohms law", "Chapter 3 Ohm's law"),   # word merged in the text
+    ("Chapter 3 Ohm's law", "Chapter 3 Ohms law"),   # word split in the text
+])
+def test_resolver_fuzzy_marker(text_heading, marker):
+    body = " states that the current through a conductor is proportional to the voltage across it"
+    text = "Introduction to the unit and what comes next. " + text_heading + body
+    resolver = TopicBoundaryResolver(text)
+    assert resolver.locate(marker + body) == text.index("Chapter 3")
+
+
+class StubEncoder:
+    """Bag-of-words hashing encoder standing in for the sentence-transformers model."""
+
+    dim = 32
+
+    def get_sentence_embedding_dimension(self):
+        return self.dim
+
+    def encode(self, texts, **kwargs):
+        vectors = np.zeros((len(texts), self.dim), dtype='float32')
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                vectors[row, int(hashlib.md5(word.encode()).hexdigest(), 16) % self.dim] += 1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1.0, norms)
+
+
+@pytest.fixture
+def stub_encoder(monkeypatch):
+    pytest.importorskip("sentence_transformers")
+    from src.retrival import registry
+    monkeypatch.setitem(registry._models, (MODEL, "torch"), StubEncoder())
+    yield
+    registry.clear()
+
+
+def _document(text, source):
+    from langchain_core.documents import Document
+    return Document(page_content=text, metadata={"source": source, "file_type": "txt"})
+
+
+def test_upsert_delete_and_filtered_search(stub_encoder, tmp_path):
+    from src.retrival.vectorStore import FaissVectorStore
+    store = FaissVectorStore(str(tmp_path / "store"), MODEL, embedding_cache_dir=None)
+    store.build_from_documents([_document("ohm law relates voltage and current", "a.txt"),
+                                _document("newton law relates force and mass", "b.txt")])
+    assert len(store.metadata.ids_for_source("a.txt")) == 1
+
+    hits = store.query("voltage and current", top_k=5, filters={"source": "b.txt"})
+    assert [hit["metadata"]["source"] for hit in hits] == ["b.txt"]
+
+    old_ids = store.metadata.ids_for_source("a.txt")
+    store.build_from_documents([_document("ohm law revised for alternating current", "a.txt")])
+    new_ids = store.metadata.ids_for_source("a.txt")
+    assert len(new_ids) == 1 and not new_ids & old_ids
+    assert store.index.ntotal == 2
+
+    assert store.delete_sources(["b.txt"]) == 1
+    assert store.query("force and mass", top_k=5, filters={"source": "b.txt"}) == []
+
+    store.save()
+    reloaded = FaissVectorStore(str(tmp_path / "store"), MODEL)
+    reloaded.load()
+    assert [hit["metadata"]["source"] for hit in reloaded.query("alternating current", top_k=5)] == ["a.txt"]
+
+
+class _Upload(io.BytesIO):
+    def __init__(self, name, data):
+        super().__init__(data)
+        self.name = name
+
+
+def test_ingest_skips_unparseable_file(stub_encoder, tmp_path):
+    from src.retrival.vectorStore import FaissVectorStore
+    from src.retrival.ingest import CHECKPOINT_FILE, ingest_files
+    uploads = [_Upload(f"notes{i}.txt", f"lecture {i} covers topic {i} in detail. ".encode() * 10) for i in range(3)]
+    uploads.insert(1, _Upload("broken.pdf", b"%PDF-1.4 garbage"))
+    store = FaissVectorStore(str(tmp_path / "store"), MODEL, embedding_cache_dir=None)
+
+    stats = ingest_files(uploads, store)
+
+    assert stats["files"] == 3 and stats["failed_files"] == 1
+    assert all(store.metadata.ids_for_source(f"notes{i}.txt") for i in range(3))
+    assert not store.metadata.ids_for_source("broken.pdf")
+    assert not os.path.exists(os.path.join(store.persist_dir, CHECKPOINT_FILE))